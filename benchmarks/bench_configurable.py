@@ -0,0 +1,250 @@
+"""
+    how long Configurable's hot paths take, by config size.
+
+        $ python -m benchmarks.bench_configurable [--sizes 1000,10000] [--only get,merge] [--json]
+
+    with --json, every result is printed as one line of json, to keep
+    around and compare against later runs. otherwise it's a table.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import timeit
+
+from flask import Flask
+
+from benchmarks.fixtures import make_config, make_deep_config, write_config_file
+from configurable import Configurable
+from formatting import FormatFactory
+
+BENCHMARKS = []
+
+
+def benchmark(function):
+    BENCHMARKS.append(function)
+    return function
+
+
+def per_call(function, number=None, repeat=3):
+    """
+    :returns float
+        the best of `repeat` runs, in microseconds per call
+    """
+    if number is None:
+        # aim for about a tenth of a second per run
+        number, elapsed = 1, 0
+        while True:
+            elapsed = timeit.timeit(function, number=number)
+            if elapsed >= 0.1:
+                break
+            number *= 10
+    best = min(timeit.repeat(function, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def make_environ(path):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': None,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def call_wsgi(application, environ):
+    def start_response(status, headers, exc_info=None):
+        pass
+    for _ in application(dict(environ), start_response):
+        pass
+
+
+def make_flask_app():
+    application = Flask('bench')
+
+    @application.route('/hello', methods=['GET'])
+    def hello():
+        return 'hello'
+
+    return application
+
+
+@benchmark
+def get(size):
+    conf_api = Configurable(defaults=make_config(size))
+    conf_api._config = {'DEBUG': True}
+
+    yield 'getitem hit', per_call(lambda: conf_api['section0'])
+    yield 'getitem path', per_call(lambda: conf_api['section0.key0'])
+    yield 'getitem flask fallback', per_call(lambda: conf_api['DEBUG'])
+    yield 'get hit', per_call(lambda: conf_api.get('section0'))
+    yield 'get miss', per_call(lambda: conf_api.get('missing', 1))
+
+
+@benchmark
+def wsgi(size):
+    bare = make_flask_app()
+    wrapped = make_flask_app()
+    Configurable(flask_app=wrapped, defaults=make_config(size))
+
+    environ = make_environ('/hello')
+    yield 'bare flask /hello', per_call(lambda: call_wsgi(bare.wsgi_app, environ))
+    yield 'configurable /hello', per_call(lambda: call_wsgi(wrapped.wsgi_app, environ))
+
+    def hello(environ, start_response):
+        start_response('200 OK', [])
+        return [b'hello']
+
+    middleware = Configurable(defaults=make_config(size)).wsgi_middleware(hello)
+    yield 'bare wsgi /hello', per_call(lambda: call_wsgi(hello, environ))
+    yield 'wsgi_middleware /hello', per_call(lambda: call_wsgi(middleware, environ))
+
+
+@benchmark
+def serve(size):
+    application = make_flask_app()
+    conf_api = Configurable(flask_app=application, defaults=make_config(size))
+    environ = make_environ('/config/')
+
+    def uncached():
+        conf_api._serialized = None
+        call_wsgi(application.wsgi_app, environ)
+
+    yield 'GET /config/ uncached', per_call(uncached)
+    yield 'GET /config/ cached', per_call(lambda: call_wsgi(application.wsgi_app, environ))
+
+    # the same routes, through flask instead of the bare responder
+    config_app = conf_api.make_config_app()
+    yield 'GET /config/ cached, flask', per_call(lambda: call_wsgi(config_app, environ))
+
+
+@benchmark
+def files(size):
+    config = make_config(size)
+    for format_name in ('yml', 'json'):
+        formatter = FormatFactory.get_formatter(format_name)
+        path = write_config_file(config, format_name)
+        try:
+            yield 'load_from_file ' + format_name, per_call(
+                lambda: Configurable.load_from_file(path, formatter))
+            yield 'save_to_file ' + format_name, per_call(
+                lambda: Configurable.save_to_file(config, path, formatter))
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+
+@benchmark
+def merge(size):
+    for shape, config in (('wide', make_config(size)), ('deep', make_deep_config(size))):
+        for copy_on_write in (False, True):
+            conf_api = Configurable(defaults=config, copy_on_write=copy_on_write)
+            mode = ' copy_on_write' if copy_on_write else ''
+            counter = [0]
+
+            def merge_one():
+                counter[0] += 1
+                conf_api.merge_in_dict(_one_leaf(conf_api.config, counter[0]))
+
+            def merge_all():
+                counter[0] += 1
+                conf_api.merge_in_dict(_every_leaf(conf_api.config, counter[0]))
+
+            yield 'merge one leaf {}{}'.format(shape, mode), per_call(merge_one)
+            yield 'merge every leaf {}{}'.format(shape, mode), per_call(merge_all, number=1)
+
+
+@benchmark
+def contention(size, readers=4, seconds=1.0):
+    for copy_on_write in (False, True):
+        conf_api = Configurable(defaults=make_config(size), copy_on_write=copy_on_write)
+        mode = ' copy_on_write' if copy_on_write else ''
+        stop = threading.Event()
+        counts = [0] * (readers + 1)
+
+        def read(i):
+            while not stop.is_set():
+                conf_api['section0']
+                conf_api.get('section1')
+                counts[i] += 2
+
+        def write():
+            while not stop.is_set():
+                conf_api.merge_in_dict({'section0': {'key0': counts[readers]}})
+                counts[readers] += 1
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        yield 'contended read{}'.format(mode), seconds * 1e6 / max(sum(counts[:readers]), 1)
+        yield 'contended write{}'.format(mode), seconds * 1e6 / max(counts[readers], 1)
+
+
+def _one_leaf(config, value):
+    key = next(iter(config))
+    section = config[key]
+    if isinstance(section, dict):
+        return {key: _one_leaf(section, value)}
+    return {key: value}
+
+
+def _every_leaf(config, value):
+    return dict((key, _every_leaf(section, value) if isinstance(section, dict) else value)
+                for key, section in config.items())
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated config sizes, in keys')
+    parser.add_argument('--only', default='',
+                        help='comma separated benchmarks to run: ' +
+                             ','.join(function.__name__ for function in BENCHMARKS))
+    parser.add_argument('--json', action='store_true', help='print json lines')
+    args = parser.parse_args(argv)
+
+    only = set(filter(None, args.only.split(',')))
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    if not args.json:
+        print('{:>12} {:>8} {:<36} {:>12}'.format('benchmark', 'keys', 'case', 'us per call'))
+    for function in BENCHMARKS:
+        if only and function.__name__ not in only:
+            continue
+        for size in sizes:
+            for case, microseconds in function(size):
+                if args.json:
+                    print(json.dumps({
+                        'benchmark': function.__name__,
+                        'keys': size,
+                        'case': case,
+                        'us_per_call': round(microseconds, 3),
+                        'python': sys.version.split()[0],
+                        'time': int(time.time()),
+                    }))
+                else:
+                    print('{:>12} {:>8} {:<36} {:>12.3f}'.format(
+                        function.__name__, size, case, microseconds))
+                sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
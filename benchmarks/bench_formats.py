@@ -0,0 +1,39 @@
+"""
+    how long the YAML formatter takes to parse and dump a config, with
+    libyaml and with pure python, next to the pickle format that the
+    binary cache (Configurable(binary_cache=True)) loads instead.
+
+        $ python -m benchmarks.bench_formats [number of keys ...]
+"""
+import sys
+import timeit
+
+from benchmarks.fixtures import make_config
+from formatting import Formatter
+from formatting.formats import Pickle
+from formatting.yaml_formats import YAML, PythonYAML
+
+
+def best_of(function, repeat=3):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(sizes):
+    formatters = [Formatter('yml', PythonYAML)]
+    if YAML.backend != PythonYAML.backend:
+        formatters.append(Formatter('yml', YAML))
+    formatters.append(Formatter('pickle', Pickle))
+
+    print('{:>8} {:>8} {:>10} {:>10} {:>10}'.format('keys', 'backend', 'bytes', 'load (s)', 'dump (s)'))
+    for keys in sizes:
+        config = make_config(keys)
+        for formatter in formatters:
+            serialized = formatter.dumps(config)
+            load = best_of(lambda: formatter.loads(serialized))
+            dump = best_of(lambda: formatter.dumps(config))
+            print('{:>8} {:>8} {:>10} {:>10.4f} {:>10.4f}'.format(
+                keys, formatter.get_backend(), len(serialized), load, dump))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
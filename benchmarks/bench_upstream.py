@@ -0,0 +1,126 @@
+"""
+    how long a write on a central Configurable takes to reach the ones
+    following it (Configurable.follow), and how many bytes that costs, by
+    number of followers. everything runs in this process, over loopback.
+
+        $ python -m benchmarks.bench_upstream [--followers 1,10,50] [--keys 10000] [--writes 20]
+"""
+import argparse
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+try:
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from socketserver import ThreadingMixIn
+
+from benchmarks.fixtures import make_config
+from configurable import Configurable
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class CountingApplication(object):
+    """
+        counts the requests to and bytes served by a WSGI application.
+    """
+    def __init__(self, application):
+        self.application = application
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        body = list(self.application(environ, start_response))
+        with self._lock:
+            self.requests += 1
+            self.bytes += sum(len(chunk) for chunk in body)
+        return body
+
+
+def not_found(environ, start_response):
+    start_response('404 Not Found', [])
+    return [b'']
+
+
+def wait_until(condition, timeout=30.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise RuntimeError('followers never caught up')
+        time.sleep(0.0005)
+
+
+def run(followers, keys, writes, long_poll, interval):
+    central = Configurable(defaults=make_config(keys))
+    counting = CountingApplication(central.wsgi_middleware(not_found))
+    server = make_server('127.0.0.1', 0, counting,
+                         server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:{}/config/'.format(server.server_port)
+
+    edges = [Configurable() for _ in range(followers)]
+    try:
+        started = time.time()
+        for edge in edges:
+            edge.follow(url, long_poll=long_poll, interval=interval)
+        wait_until(lambda: all(len(edge.config) == len(central.config) for edge in edges))
+        first_sync = time.time() - started
+
+        requests, sent = counting.requests, counting.bytes
+        latencies = []
+        for i in range(writes):
+            started = time.time()
+            central.merge_in_dict({'section0': {'key0': i}})
+            wait_until(lambda: all(edge.get('section0.key0') == i for edge in edges))
+            latencies.append(time.time() - started)
+        latencies.sort()
+
+        return {
+            'first sync (s)': first_sync,
+            'median (ms)': latencies[len(latencies) // 2] * 1e3,
+            'max (ms)': latencies[-1] * 1e3,
+            'requests/write': float(counting.requests - requests) / writes,
+            'bytes/write': float(counting.bytes - sent) / writes,
+        }
+    finally:
+        for edge in edges:
+            edge.stop_following()
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--followers', default='1,10,50', help='comma separated follower counts')
+    parser.add_argument('--keys', type=int, default=10000, help='keys in the central config')
+    parser.add_argument('--writes', type=int, default=20, help='writes to time')
+    parser.add_argument('--interval', type=float, default=0.05,
+                        help='seconds between polls, without long polling')
+    args = parser.parse_args(argv)
+
+    columns = ['first sync (s)', 'median (ms)', 'max (ms)', 'requests/write', 'bytes/write']
+    print('{:>10} {:>10} '.format('mode', 'followers') +
+          ' '.join('{:>15}'.format(column) for column in columns))
+    for long_poll in (True, False):
+        for followers in [int(count) for count in args.followers.split(',')]:
+            result = run(followers, args.keys, args.writes, long_poll, args.interval)
+            print('{:>10} {:>10} '.format('long poll' if long_poll else 'poll', followers) +
+                  ' '.join('{:>15.3f}'.format(result[column]) for column in columns))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
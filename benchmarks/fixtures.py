@@ -0,0 +1,49 @@
+"""
+    generated configs for the benchmarks, so they don't need anything
+    checked in or fetched.
+"""
+import os
+import tempfile
+
+from configurable import Configurable
+from formatting import FormatFactory
+
+
+def make_config(keys, width=10):
+    """
+        a config with about `keys` leaves, `width` to a section, as wide as
+        it needs to be.
+
+    :returns dict
+    """
+    return dict(('section{}'.format(i), dict(('key{}'.format(j), 'value {} {}'.format(i, j))
+                                             for j in range(width)))
+                for i in range(max(keys // width, 1)))
+
+
+def make_deep_config(keys, depth=8):
+    """
+        a config with about `keys` leaves at the bottom of `depth` levels
+        of two-way sections.
+
+    :returns dict
+    """
+    if depth == 0 or keys <= 2:
+        return dict(('key{}'.format(i), i) for i in range(max(keys, 1)))
+    return {
+        'left': make_deep_config(keys // 2, depth - 1),
+        'right': make_deep_config(keys - keys // 2, depth - 1),
+    }
+
+
+def write_config_file(config, format_name, directory=None):
+    """
+        dumps `config` to a new file in `directory` (a temp dir by default).
+
+    :returns str
+        the file's path
+    """
+    directory = directory or tempfile.mkdtemp(prefix='configurable-bench-')
+    path = os.path.join(directory, 'config.{}'.format(format_name))
+    Configurable.save_to_file(config, path, FormatFactory.get_formatter(format_name))
+    return path
@@ -0,0 +1,1339 @@
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import stat
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import RLock, current_thread
+
+from configurable.changes import (MISSING, STRING_TYPES, apply_changes, compose_patches,
+                                  diff_changes, flatten_changes, flatten_path,
+                                  merge_changes)
+from configurable.fragments import Fragments, difference, merge_into
+from configurable.layers import Layers, environment_layer
+from configurable.metrics import Metrics, TimedLock
+from configurable.merkle import MerkleHashes
+from configurable.notifier import VersionNotifier
+from configurable.persistence import Journal, WriteBehind, load_through_cache
+from configurable.schema import Schema
+from configurable.subscriptions import Subscriptions
+from configurable.watching import FileWatcher, file_signature
+from configurable.web import ConfigRoutes, Request, WSGIResponder
+from formatting import FormatFactory
+
+# how many '.'-notation paths to remember the split of
+_MAX_PATH_KEYS = 4096
+
+
+class Configurable(object):
+    def __init__(self, flask_app=None, defaults=None, local_file=None,
+                 local_file_formatter=None, logger=None,
+                 copy_on_write=False, save_delay=None, save_max_pending=None,
+                 journal=False, journal_compact_every=1000, binary_cache=False,
+                 metrics=False, shared_file=None, api_writes=False,
+                 changes_kept=1000, prefix='/config/', history=0, hashes=False,
+                 environment_prefix=None, schema=None, config_dir=None):
+        """
+        :param flask_app: the application you want to make Configurable
+         :type flask_app: flask.Flask
+
+        :param defaults: (optional) values you want to start off with
+         :type defaults: dict
+
+        :param local_file: (optional) path to a local config file
+         :type local_file: str
+
+        :param local_file_formatter: (optional) local file formatter
+            default: the one for local_file's extension (see
+            FormatFactory.for_path), yml if it has none we know
+
+            the Formatter class is currently both the interface required
+            as well as the default implementation covering {yaml, json}..
+
+            TODO: fix mix of interface definition vs implementation or think about it?
+         :type local_file_formatter: utils.configuration.Formatter
+
+        :param logger: (optional) the logger you'd like to use with this
+         :type logger: logging.Logger
+
+        :param copy_on_write: (optional) never modify self.config in place
+            default: False
+
+            writers build a new config (sharing every untouched subtree with
+            the old one) under self.lock and swap it in as self.config, so
+            readers never need the lock and never see a half-applied write.
+            in exchange, the config you read must be treated as read-only:
+            `config['a']['b'] = 1` would change a snapshot other readers hold.
+         :type copy_on_write: bool
+
+        :param save_delay: (optional) save local_file in the background
+            default: None (every `config[key] = value` saves right away)
+
+            writes only mark the config dirty; a background thread saves it
+            at most `save_delay` seconds later, once for all the writes in
+            between. call flush() to save right away. pending writes are
+            also flushed when the interpreter exits.
+         :type save_delay: float
+
+        :param save_max_pending: (optional) with save_delay, don't wait out
+            the delay once this many writes are pending
+         :type save_max_pending: int
+
+        :param journal: (optional) append writes to a journal next to
+            local_file (at local_file + '.journal') instead of saving the
+            whole config on every write
+            default: False
+
+            load() replays the journal on top of local_file, and every
+            save() empties it.
+         :type journal: bool
+
+        :param journal_compact_every: (optional) with journal, save the
+            whole config (and empty the journal) after this many writes
+         :type journal_compact_every: int
+
+        :param binary_cache: (optional) keep a pickled snapshot of the parsed
+            local_file next to it (at local_file + '.cache') and load that
+            instead of parsing, for as long as local_file is unchanged
+            default: False
+         :type binary_cache: bool
+
+        :param metrics: (optional) measure what this costs: True, or your own
+            Metrics (say, with hooks that forward to your telemetry). served
+            at /config/metrics, and kept in self.metrics
+            default: False (nothing gets measured)
+         :type metrics: bool or configurable.metrics.Metrics
+
+        :param shared_file: (optional) share the config with every other
+            process (say, your other gunicorn workers) using the same file
+
+            the file gets memory-mapped, and every write puts a pickled
+            snapshot of the whole config in it, stamped with a new
+            generation. the other processes check the generation when they
+            read (and their writes take an flock() on the file), and only
+            unpickle when it moved. a process that finds a snapshot there
+            on startup uses it instead of parsing local_file.
+            somewhere in /dev/shm keeps it off the disk.
+         :type shared_file: str
+
+        :param api_writes: (optional) let PATCH (or POST) /config/ merge
+            into the config. anyone who can reach /config/ can then change
+            it, so only where that's fine (or something in front checks).
+            default: False
+         :type api_writes: bool
+
+        :param changes_kept: (optional) how many writes to remember the
+            changed paths of, to answer GET /config/?since=<version> (and
+            changes_since()) with just what changed
+         :type changes_kept: int
+
+        :param prefix: (optional) where the config routes are mounted in
+            your application, instead of /config/. not '/': they'd take
+            every request from your app.
+         :type prefix: str
+
+        :param history: (optional) how many versions of the config to keep,
+            for history(), diff() and rollback()
+            default: 0 (none)
+
+            old versions are kept by reference, which is only safe when
+            they're never changed: history turns copy_on_write on. a version
+            shares every subtree its write didn't touch, but the dicts on the
+            way to a change are shallow copies, so it costs the width of those
+            dicts (all the top-level keys, at least), not just what changed.
+         :type history: int
+
+        :param hashes: (optional) keep a content hash of every subtree,
+            updated by each write along the paths it changed (see
+            config_hash and GET /config/hash). hashing the whole config
+            takes one walk over it, when it's made.
+            default: False
+         :type hashes: bool
+
+        :param environment_prefix: (optional) take the environment variables
+            starting with this as a layer over the config: with 'MYAPP_',
+            MYAPP_MYSQL__HOST=db makes config['mysql.host'] 'db' (see
+            configurable.layers.environment_layer, and add_layer)
+         :type environment_prefix: str
+
+        :param schema: (optional) what the config may hold: a
+            configurable.schema.Schema, or the rules to make one from. a
+            load is checked in full, every other write only at the paths it
+            changes, and one that doesn't fit raises SchemaError and
+            changes nothing. the defaults aren't checked.
+         :type schema: configurable.schema.Schema or dict
+
+        :param config_dir: (optional) a conf.d directory: its files are
+            merged in name order (see configurable.fragments.Fragments) and
+            loaded like local_file, which (if there's one too) goes on top
+            of them. a save writes only what differs from the directory
+            into local_file, so a later edit to a fragment still shows. a
+            load only parses the files that changed since the last one.
+         :type config_dir: str
+        """
+        self._conf_app = None  # used to hold the /config/ app
+        self._wsgi_app = None  # used to retain your app's _wsgi_app
+        self._config = None  # used to retain your app's config
+        if not prefix.strip('/'):
+            raise ValueError("the config routes can't be mounted at '/'")
+        self.routes = ConfigRoutes(self, prefix='/' + prefix.strip('/') + '/')
+        self._prefix = self.routes.prefix
+
+        self.copy_on_write = copy_on_write or bool(history)
+        self.api_writes = api_writes
+        self.schema = Schema(schema) if isinstance(schema, dict) else schema
+        # a copy: writes (and load()s) change self.config, not your defaults
+        self.config = copy.deepcopy(defaults or {})
+        self.version = 0  # bumped on every write to self.config
+        self.metrics = Metrics() if metrics is True else (metrics or None)
+        self.lock = RLock()
+        if self.metrics:
+            self.lock = TimedLock(self.lock, self.metrics)
+
+        self._serialized = None  # (version, body, etag) of the last GET /config/
+        self._lookups = (0, {})  # (version, dict['.'-notation path] => value)
+        self._path_keys = {}  # dict['.'-notation path] => tuple of keys
+        # (version, paths it changed) of the last changes_kept writes
+        self._recent_changes = deque(maxlen=changes_kept)
+        # the version each path was last written at, and the version
+        # something at or under each path was (for serialized_subtree)
+        self._set_at = {}
+        self._touched = {}
+        self._serialized_subtrees = {}  # path tuple => (version, body, etag)
+        # (version, time, config, changed paths) of the last `history` versions
+        self._history = deque(maxlen=history)
+        self._layers = None  # Layers, once there's more than self.config
+        self._layers_version = 0  # bumped whenever the layers' view changes
+        self._layer_files = {}  # layer name => (path, file_signature) it was read at
+        self._hashes = MerkleHashes(self.config) if hashes else None
+        if history:
+            self._history.append((self.version, time.time(), self.config, ()))
+
+        self.local_file = local_file
+        if local_file and local_file_formatter is None:
+            local_file_formatter = FormatFactory.for_path(local_file)
+        self.local_file_formatter = local_file_formatter
+        self.cache_file = local_file + '.cache' if local_file and binary_cache else None
+
+        self.logger = logger
+        self._fragments = Fragments(config_dir, logger=logger) if config_dir else None
+
+        self._journal = None
+        if local_file and journal:
+            self._journal = Journal(local_file + '.journal', logger=logger)
+        self.journal_compact_every = journal_compact_every
+
+        self._shared = None
+        if shared_file:
+            # imported here: it needs fcntl and mmap, and not everyone shares
+            from configurable.shared import SharedRegion
+            self._shared = SharedRegion(shared_file)
+        self._shared_generation = 0  # of the last snapshot we wrote or read
+        self._shared_source = None  # the _source that snapshot came with
+        self._source = None  # _source_signature() as of the last load
+        self._shared_formatter = FormatFactory.get_formatter('pickle')
+
+        self._subscriptions = Subscriptions(logger=logger)
+        self.notifier = VersionNotifier()  # wakes GET /config/watch
+        self._watcher = None
+        self._upstream = None
+        self._write_behind = None
+        if local_file and save_delay is not None:
+            self._write_behind = WriteBehind(self.save, delay=save_delay,
+                                             max_pending=save_max_pending,
+                                             logger=logger)
+            atexit.register(self._write_behind.close)
+
+        # another process may have parsed local_file for us already (as it
+        # is now: a snapshot can outlive a restart, and the file's edits)
+        shared = self._shared is not None and self._pull_shared(
+            check_source=bool(local_file or config_dir))
+        if (local_file or config_dir) and not shared:
+            self.load()
+
+        if environment_prefix:
+            self.add_layer('environment', environment_layer(environment_prefix,
+                                                            coerce=self._coerce))
+        self.environment_prefix = environment_prefix
+
+        if flask_app:
+            self.attach_to_flask_app(flask_app)
+
+    def attach_to_flask_app(self, application):
+        """
+        While this method gets called if you initialize your Configurable with
+        a Flask application, there may be instances where you'd like to attach it
+        later.
+
+        :param application: a flask application to attach to
+         :type application: flask.Flask
+        """
+        self._conf_app = WSGIResponder(self.routes)
+        self._wsgi_app = application.wsgi_app
+        self._config = application.config
+        setattr(application, 'wsgi_app', self)
+        setattr(application, 'config', self)
+        # under the config, the way lookups fell back to it before layers
+        self.add_layer('flask', self._config, above=None)
+
+    def wsgi_middleware(self, application):
+        """
+            wraps any WSGI application so that the config routes (at
+            /config/, or your prefix) are served from here. the
+            application's own config isn't touched: for flask, see
+            attach_to_flask_app.
+
+        :param application: the WSGI application to wrap
+         :type application: callable
+
+        :returns callable
+            the WSGI application to serve instead
+        """
+        prefix = self._prefix
+        responder = WSGIResponder(self.routes)
+
+        def middleware(environ, start_response):
+            if environ['PATH_INFO'].startswith(prefix):
+                return responder(environ, start_response)
+            return application(environ, start_response)
+        return middleware
+
+    def make_config_app(self):
+        """
+            the config routes as a flask application of their own, for
+            mounting it yourself. the routes themselves are in self.routes
+            (see configurable.web), which it hands every request to.
+
+            attach_to_flask_app doesn't use it: it serves the routes with a
+            bare WSGIResponder, skipping flask's request handling.
+        """
+        from flask import Flask, Response, request
+
+        config_app = Flask('configurable')
+        methods = ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+        @config_app.route(self._prefix, defaults={'rest': ''}, methods=methods)
+        @config_app.route(self._prefix + '<path:rest>', methods=methods)
+        def config_route(rest):
+            handled = self.routes.handle(Request(
+                request.method, request.path,
+                query_string=request.environ.get('QUERY_STRING', ''),
+                headers=dict((name.lower(), value) for name, value in request.headers.items()),
+                body=request.get_data()))
+            return Response(handled.body, status=handled.status, headers=handled.headers)
+
+        return config_app
+
+    def serialized_config(self):
+        """
+            the json of the current config along with its (strong) etag.
+
+            the serialization is cached per version, so repeated calls
+            between writes don't re-serialize the config.
+
+        :returns tuple
+            (body, etag)
+        """
+        _, body, etag = self._serialize()
+        return body, etag
+
+    def _serialize(self):
+        """
+        :returns tuple
+            (version, body, etag): serialized_config(), and the version it's of
+        """
+        # read the version before the config: a write swaps in the config
+        # before bumping the version, so at worst we cache a newer body
+        # under an older version (and just re-serialize next time).
+        if self._shared is not None and self._shared.generation() != self._shared_generation:
+            self._pull_shared()
+        version = self.version
+        cached = self._serialized
+        if cached is None or cached[0] != version:
+            body = json.dumps(self.config)
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            cached = (version, body, hashlib.sha1(body).hexdigest())
+            self._serialized = cached
+        return cached
+
+    def serialized_subtree(self, item):
+        """
+            the json of self[item] (where `item` may be a '.'-notation path)
+            along with its etag.
+
+            each subtree's serialization is cached until a write changes
+            something in it, so writes elsewhere in the config don't cost
+            it a re-serialization (and its etag stays the same).
+
+        :returns tuple
+            (body, etag)
+
+        :raises KeyError
+            if there's nothing at `item`
+        """
+        if self._shared is not None and self._shared.generation() != self._shared_generation:
+            self._pull_shared()
+        keys = self._keys_of(item, self.config)
+        # the version before the value, as in _serialize()
+        version = self._subtree_version(keys)
+        cached = self._serialized_subtrees.get(keys)
+        if cached is None or cached[0] != version:
+            value = self.config
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    raise KeyError(item)
+                value = value[key]
+            body = json.dumps(value)
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            cached = (version, body, hashlib.sha1(body).hexdigest())
+            if len(self._serialized_subtrees) >= _MAX_PATH_KEYS:
+                self._serialized_subtrees = {}
+            self._serialized_subtrees[keys] = cached
+        return cached[1], cached[2]
+
+    def _subtree_version(self, keys):
+        """
+        :returns int
+            the last version that changed anything at or under `keys`
+        """
+        version = self._touched.get(keys, 0)
+        set_at = self._set_at
+        for depth in range(len(keys)):
+            version = max(version, set_at.get(keys[:depth], 0))
+        return version
+
+    def changes_since(self, version):
+        """
+            what changed after `version`, as of now: every path written
+            since, with the value it has now. a path under another one that
+            changed is left out (it's in its parent's value).
+
+            only the last `changes_kept` writes are remembered.
+
+        :param version: a version of this Configurable (see self.version)
+         :type version: int
+
+        :returns tuple
+            (version, dict[flattened_path] => value, list of removed
+            flattened paths), or None if the changes since `version` are no
+            longer (or never were) all known
+        """
+        delta = self._changes_since(version)
+        if delta is None:
+            return None
+        current, changed, removed = delta
+        return (current, dict((flatten_path(path), value) for path, value in changed.items()),
+                [flatten_path(path) for path in removed])
+
+    def _changes_since(self, version):
+        """
+            changes_since, with path tuples instead of flattened paths.
+        """
+        with self.lock:
+            current = self.version
+            recent = self._recent_changes
+            if version == current:
+                return current, {}, []
+            if version > current or not recent or recent[0][0] > version + 1:
+                return None
+
+            paths = set()
+            for changed_version, changed_paths in reversed(recent):
+                if changed_version <= version:
+                    break
+                paths.update(changed_paths)
+
+            changed, removed = {}, []
+            kept = set()
+            for path in sorted(paths, key=len):
+                if any(path[:depth] in kept for depth in range(1, len(path))):
+                    continue
+                kept.add(path)
+                value = self.config
+                for key in path:
+                    value = value.get(key, MISSING) if isinstance(value, dict) else MISSING
+                if value is MISSING:
+                    removed.append(path)
+                else:
+                    changed[path] = value
+            return current, changed, removed
+
+    def load(self):
+        """
+            loads the configuration into the state config. thread-safe
+
+            only what differs from the current config gets changed: every
+            subtree that's the same in the file keeps its identity, and if
+            nothing changed the version doesn't move.
+            layers read from a file (see add_layer) are read again if they
+            changed.
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value), as merge_in_dict
+
+        :raises SchemaError
+            if there's a schema and the file doesn't fit it (the config
+            stays as it was)
+        """
+        started = self.metrics and self.metrics.clock()
+        with self._writing():
+            # before reading: a file changed while it's read is read again
+            source = self._source_signature()
+            # an empty yaml file is None
+            config = Configurable.load_from_file(self.local_file,
+                                                 self.local_file_formatter,
+                                                 logger=self.logger,
+                                                 cache_path=self.cache_file) or {}
+            if self._fragments is not None:
+                config = merge_into(self._fragments.load(), config)
+            partial_journal = self._journal and not self._journal.replay(config)
+            self.schema and self.schema.validate(config)
+
+            self._source = source
+            changes = self._replace(config)
+            self._layer_files and self.reload_layers()
+            if not changes and self._shared is not None and self._shared_source != source:
+                # the same config, but the snapshot has to say it's current
+                self._share(self.config)
+
+            if partial_journal:
+                # later appends would land after the partial record, where
+                # replay never gets to. start over from a full save.
+                self.save()
+        self.metrics and self.metrics.observe('load', started)
+        return flatten_changes(changes)
+
+    def watch(self, interval=1.0, use_inotify=True):
+        """
+            load()s local_file, config_dir and the layers read from files
+            (see add_layer) in the background whenever any of them changes.
+            with only layer files, those are read again instead.
+
+            while nothing does, that costs one stat() per file (and a
+            listdir() of config_dir) per interval. inotify watches the
+            directory of local_file, or config_dir; other files are only
+            looked at every interval. a file that fails to parse is logged
+            and otherwise ignored.
+
+        :param interval: (optional) seconds between looks at the files
+         :type interval: float
+
+        :param use_inotify: (optional) on linux, react to writes right away
+         :type use_inotify: bool
+        """
+        if self._watcher is not None:
+            return
+        if self.local_file or self._fragments is not None:
+            path = self.local_file or self._fragments.directory
+            on_change = self.load
+        elif self._layer_files:
+            path = sorted(self._layer_files.values())[0][0]
+            on_change = self.reload_layers
+        else:
+            self.logger and self.logger.warning(
+                'nothing to watch: no local_file, config_dir or layer files')
+            return
+        self._watcher = FileWatcher(path, on_change,
+                                    interval=interval,
+                                    use_inotify=use_inotify,
+                                    logger=self.logger,
+                                    signature=self._watched_signature)
+
+    def _watched_signature(self):
+        source = self._source_signature()
+        if self.local_file and source[0][1] is None:
+            # gone for now (an editor swapping it in, say): don't load nothing
+            return None
+        return source + tuple(
+            (path, file_signature(path)) for path, _ in sorted(self._layer_files.values()))
+
+    def follow(self, url, **options):
+        """
+            keeps this config in step with another Configurable's, served
+            at `url` (say, http://central:5000/config/), instead of (or on
+            top of) local_file. see configurable.upstream.Upstream for the
+            options.
+
+        :returns configurable.upstream.Upstream
+        """
+        if self._upstream is None:
+            # imported here: http clients are slow to import, and most
+            # configs don't follow anything
+            from configurable.upstream import Upstream
+            options.setdefault('logger', self.logger)
+            self._upstream = Upstream(self, url, **options)
+        return self._upstream
+
+    def stop_following(self):
+        if self._upstream is not None:
+            self._upstream.stop()
+            self._upstream = None
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def history(self):
+        """
+        :returns list
+            [(version, time it was made, ['.'-notation paths it changed]), ...]
+            of the versions kept (see `history`), oldest first
+        """
+        return [(version, made, [flatten_path(path) for path in paths])
+                for version, made, _, paths in list(self._history)]
+
+    def diff(self, from_version, to_version=None):
+        """
+            what changed between two kept versions. subtrees the versions
+            share are skipped without looking inside, so this costs the
+            width of the dicts on the way to what changed (their keys are
+            each compared by identity), not the size of the whole config.
+
+        :param from_version: a kept version
+         :type from_version: int
+
+        :param to_version: (optional) a later (or earlier) kept version
+            default: the current one
+         :type to_version: int
+
+        :returns dict
+            dict[flattened_path] => (value in to_version, value in from_version),
+            as merge_in_dict
+
+        :raises KeyError
+            if either version isn't kept
+        """
+        to_config = self._version_config(to_version)
+        return flatten_changes(diff_changes(self._version_config(from_version),
+                                            to_config, [], {}))
+
+    def rollback(self, version):
+        """
+            makes the config what it was at a kept version, as a new write:
+            listeners hear about it, it's saved (or journaled), and the
+            version goes up (it doesn't go back to `version`).
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value), as merge_in_dict
+
+        :raises KeyError
+            if the version isn't kept
+        """
+        return self._commit_diff(self._version_config(version), save=True)
+
+    def _commit_diff(self, config, save=False):
+        """
+            makes self.config equal to `config` as one write (committed, and
+            journaled, unlike _replace).
+
+        :param save: (optional) see _commit
+         :type save: bool
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value)
+        """
+        with self._writing():
+            changes = diff_changes(self.config, config, [], {})
+            if changes:
+                self._commit(changes, save=save)
+        return flatten_changes(changes)
+
+    def _commit_paths(self, values, removed, keys=None):
+        """
+            sets '.'-notation paths to values (replacing what's there, not
+            merging into it) and removes others, as one write. what GET
+            /config/?since= answers with goes in here.
+
+        :param values: dict['.'-notation path] => value
+         :type values: dict
+
+        :param removed: '.'-notation paths to remove
+         :type removed: list
+
+        :param keys: (optional) dict['.'-notation path] => its keys, for
+            paths with a key that has a '.' in it
+         :type keys: dict
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value)
+        """
+        keys = keys or {}
+        with self._writing():
+            changes = {}
+            for path, value in values.items():
+                _set_change(changes, self.config, tuple(keys.get(path) or path.split('.')), value)
+            for path in removed:
+                path = tuple(keys.get(path) or path.split('.'))
+                value = self.config
+                for key in path:
+                    value = value.get(key, MISSING) if isinstance(value, dict) else MISSING
+                if value is not MISSING:
+                    changes[path] = (MISSING, value)
+            if changes:
+                self._commit(changes, save=False)
+        return flatten_changes(changes)
+
+    def _version_config(self, version):
+        if version is None:
+            return self.config
+        history = self._history
+        # every version gets kept, so they're consecutive
+        index = version - history[0][0] if history else -1
+        if not 0 <= index < len(history):
+            raise KeyError(version)
+        return history[index][2]
+
+    def config_hash(self, item=''):
+        """
+            the content hash of self[item] ('' for the whole config), which
+            is the same wherever the content is: compare it with another
+            process' or host's to know if they agree, without sending the
+            config over. needs `hashes`.
+
+        :raises KeyError
+            if there's nothing at `item`
+        """
+        return self.subtree_hashes(item, depth=0)[item]
+
+    def subtree_hashes(self, item='', depth=1):
+        """
+            the hashes of self[item] and of what's under it, `depth` levels
+            down: where two configs' hashes differ, look one level deeper
+            to find out where, and skip the rest.
+
+        :param item: (optional) a '.'-notation path, '' for the whole config
+         :type item: str
+
+        :param depth: (optional) how many levels under `item` to go
+         :type depth: int
+
+        :returns dict
+            dict[flattened_path] => hash
+
+        :raises KeyError
+            if there's nothing at `item`
+        """
+        if self._hashes is None:
+            raise ValueError('made without hashes')
+        if self._shared is not None and self._shared.generation() != self._shared_generation:
+            self._pull_shared()
+
+        with self.lock:
+            keys = self._keys_of(item, self.config) if item else ()
+            value = self.config
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    raise KeyError(item)
+                value = value[key]
+
+            hashes = {}
+            stack = [(keys, value, depth)]
+            while stack:
+                keys, value, levels = stack.pop()
+                hashes[flatten_path(keys)] = self._hashes.hash_of(value, keys)
+                if levels and isinstance(value, dict):
+                    stack.extend((keys + (key,), child, levels - 1)
+                                 for key, child in value.items())
+            return hashes
+
+    def add_layer(self, name, values, above='config'):
+        """
+            stacks a dict over (or under) the config: lookups (config[key],
+            get) then see all of them merged, where the layer highest up
+            wins. dicts merge; anything else replaces what's under it.
+
+            the merged view is built once and after that only re-resolved
+            at the paths that change (in any layer), so a lookup stays one
+            dict hit. writes (merge_in_dict, load, ...) still go to the
+            config, and the config is what's saved and served at /config/.
+
+            the layers, from the bottom: 'flask' (your app's own config,
+            with attach_to_flask_app), 'config' (defaults, local_file and
+            writes), 'environment' (with environment_prefix), 'overrides'
+            (see override). the defaults aren't a layer of their own: a
+            load() replaces them with the file, as it always has, so
+            source_of says 'config' for both.
+
+            a layer can be a file (a per-deployment override file, say):
+            it's read with the formatter for its extension, and read again
+            by load(), reload_layers() and watch() once it changes.
+
+        :param name: the layer's name, as source_of reports it
+         :type name: str
+
+        :param values: what's in it, or the path of a file to read it from.
+            don't change a dict you pass: set_layer instead.
+         :type values: dict or str
+
+        :param above: (optional) the layer to put it right over; None for
+            the very bottom
+         :type above: str
+        """
+        with self.lock:
+            if isinstance(values, STRING_TYPES):
+                values = self._read_layer(name, values)
+            if self._layers is None:
+                layers = Layers()
+                layers.insert(0, 'config', self.config)
+            else:
+                layers = self._layers
+            layers.insert(0 if above is None else layers.names.index(above) + 1, name, values)
+            self._layers = layers
+            self._layers_version += 1
+
+    def set_layer(self, name, values):
+        """
+            replaces what's in a layer. only what differs gets resolved again.
+        """
+        with self.lock:
+            self._layers.replace(name, values)
+            self._layers_version += 1
+
+    def reload_layers(self):
+        """
+            reads the layers that are files again, if they changed.
+
+        :returns list
+            the names of the layers that were read again
+        """
+        reloaded = []
+        with self.lock:
+            for name, (path, signature) in sorted(self._layer_files.items()):
+                if file_signature(path) != signature:
+                    self.set_layer(name, self._read_layer(name, path))
+                    reloaded.append(name)
+        return reloaded
+
+    def _read_layer(self, name, path):
+        self._layer_files[name] = (path, file_signature(path))
+        values = Configurable.load_from_file(path, FormatFactory.for_path(path),
+                                             logger=self.logger)
+        # an empty yaml file is None
+        return values or {}
+
+    def layers(self):
+        """
+        :returns list
+            the names of the layers, from the bottom up
+        """
+        return list(self._layers.names) if self._layers is not None else ['config']
+
+    def reload_environment(self):
+        """
+            takes the environment variables (with environment_prefix) in again.
+        """
+        if self.environment_prefix:
+            self.set_layer('environment', environment_layer(self.environment_prefix,
+                                                            coerce=self._coerce))
+
+    @property
+    def _coerce(self):
+        # environment variables are strings: the schema may know better
+        return self.schema.coerce if self.schema is not None else None
+
+    def override(self, item, value):
+        """
+            sets `item` (a '.'-notation path) in the 'overrides' layer, on
+            top of every other: it's not saved, and writes to the config
+            don't change what lookups see until clear_override.
+        """
+        with self.lock:
+            if self._layers is None or 'overrides' not in self._layers.names:
+                self.add_layer('overrides', {}, above=self.layers()[-1])
+            overrides = self._layers.values[self._layers.names.index('overrides')]
+            self.set_layer('overrides', compose_patches([overrides, {item: value}]))
+
+    def clear_override(self, item):
+        with self.lock:
+            if self._layers is None or 'overrides' not in self._layers.names:
+                return
+            overrides = copy.deepcopy(
+                self._layers.values[self._layers.names.index('overrides')])
+            keys = item.split('.')
+            node = overrides
+            for key in keys[:-1]:
+                node = node.get(key)
+                if not isinstance(node, dict):
+                    return
+            node.pop(keys[-1], None)
+            self.set_layer('overrides', overrides)
+
+    def source_of(self, item):
+        """
+        :returns str
+            the name of the layer config[item] comes from (for a section
+            merged from several, the highest of them)
+
+        :raises KeyError
+            if there's nothing at `item`
+        """
+        if self._layers is None:
+            self._lookup(item)
+            return 'config'
+        layers = self._layers
+        source = layers.source_of(self._keys_of(item, layers.view))
+        if source is None:
+            raise KeyError(item)
+        return source
+
+    def resolved(self):
+        """
+        :returns dict
+            the config as lookups see it: every layer merged. read-only.
+        """
+        return self._layers.view if self._layers is not None else self.config
+
+    def _replace(self, config, share=True):
+        """
+            makes self.config equal to `config` by changing only what
+            differs. must be called with self.lock held.
+
+        :returns dict
+            dict[path tuple] => (new_value, old_value)
+        """
+        changes = diff_changes(self.config, config, [], {})
+        if changes:
+            self._publish(apply_changes(self.config, changes, self.copy_on_write),
+                          changes, share=share)
+        return changes
+
+    def _publish(self, config, changes, share=True):
+        """
+            makes `config` the current state and bumps the version.
+            must be called with self.lock held (see _writing).
+
+        :param config: the new state
+         :type config: dict
+
+        :param changes: what changed
+            dict[path tuple] => (new_value, old_value) (see changes.merge_changes)
+         :type changes: dict
+
+        :param share: (optional) pass it on to the other processes using
+            shared_file. False for what came from there in the first place.
+         :type share: bool
+        """
+        # readers of (version, config) read the version first, so the
+        # config has to be swapped in before the version moves.
+        self.config = config
+        if self._layers is not None:
+            self._layers.replace('config', config, paths=changes)
+            self._layers_version += 1
+        self.version += 1
+        self._recent_changes.append((self.version, tuple(changes)))
+        if self._history.maxlen:
+            self._history.append((self.version, time.time(), config, tuple(changes)))
+        if self._hashes is not None:
+            self._hashes.update(changes)
+        for path in changes:
+            self._set_at[path] = self.version
+            for depth in range(len(path) + 1):
+                self._touched[path[:depth]] = self.version
+
+        if share and self._shared:
+            self._share(config)
+
+        self._subscriptions.notify(changes)
+        self.notifier.publish(self.version)
+
+    @contextmanager
+    def _writing(self):
+        """
+            what every write happens under: self.lock, and with shared_file
+            also the other processes' writers excluded, after catching up
+            with what they wrote.
+        """
+        with self.lock:
+            if self._shared is None:
+                yield
+            else:
+                with self._shared.locked():
+                    self._pull_shared()
+                    yield
+
+    def _pull_shared(self, check_source=False):
+        """
+            applies the snapshot another process left in shared_file, if
+            there's a new one.
+
+        :param check_source: (optional) only if it was made from the files
+            load() would read as they are now. a stale one is skipped for
+            good: the next load() replaces it.
+         :type check_source: bool
+
+        :returns bool
+            whether there was one
+        """
+        with self.lock:
+            generation, payload = self._shared.read()
+            if payload is None or generation == self._shared_generation:
+                return False
+            self._shared_generation = generation
+            snapshot = self._shared_formatter.loads(payload)
+            source, config = snapshot if isinstance(snapshot, tuple) else (None, snapshot)
+            if check_source and source != self._source_signature():
+                return False
+            self._shared_source = self._source = source
+            self._replace(config, share=False)
+            return True
+
+    def _share(self, config):
+        """
+            writes `config` to shared_file, stamped with where it was
+            loaded from. must be called with the shared lock held.
+        """
+        self._shared_generation = self._shared.write(
+            self._shared_formatter.dumps((self._source, config)))
+        self._shared_source = self._source
+
+    def _source_signature(self):
+        """
+        :returns tuple
+            ((path, file_signature), ...) of every file load() reads
+        """
+        paths = [self.local_file] if self.local_file else []
+        if self._fragments is not None:
+            paths.extend(self._fragments.paths())
+        return tuple((path, file_signature(path)) for path in paths)
+
+    def subscribe(self, prefix, callback, background=False):
+        """
+            calls `callback` after every write (merge_in_dict, load or
+            `config[key] = value`) that changed something under `prefix`.
+
+            without `background`, the callback runs on the writer's thread,
+            while it holds self.lock: keep it short.
+
+        :param prefix: '.'-notation path to listen under ('' for everything)
+         :type prefix: str
+
+        :param callback: called with dict[flattened_path] => (new_value, old_value)
+            of what changed under `prefix`, same as merge_in_dict returns
+         :type callback: callable
+
+        :param background: (optional) call it on a worker thread instead
+         :type background: bool
+        """
+        self._subscriptions.subscribe(prefix, callback, background=background)
+
+    def unsubscribe(self, prefix, callback):
+        self._subscriptions.unsubscribe(prefix, callback)
+
+    def merge_in_dict(self, dict_to_merge):
+        """
+        Notes:
+            we can only really merge dicts. the primitive types obviously
+            get overwritten, but when questions of lists and other
+            data structures arise it's unclear what 'merging' might mean.
+
+            the whole merge is applied under self.lock and bumps the version
+            once. with copy_on_write, readers see either all of it or none.
+
+            a merge only changes memory, unless there's a journal: then
+            it's appended there (it never rewrites local_file itself).
+
+        :param dict_to_merge: the dict with the new state you want
+         :type dict_to_merge: dict
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value)
+            - the paths are flattened using '.'-notation with
+            - TODO: see if this is a good idea. current reasons:
+                1. it's easy to len(dict) and see # of change
+                2. i see most of its use in writing it as a log
+                   and for verification. i dont think it matters
+                   to keep the structure (though this does allow
+                   full regeneration and '.' notation is pretty
+                   well understood visually)
+                3. it's easier than to have to recurse through a
+                   nested change dict when going through it?
+        """
+        started = self.metrics and self.metrics.clock()
+        with self._writing():
+            changes = merge_changes(self.config, dict_to_merge, [], {})
+            if changes:
+                self._commit(changes, save=False)
+        self.metrics and self.metrics.observe('merge', started)
+        return flatten_changes(changes)
+
+    def _commit(self, changes, save=True):
+        """
+            applies `changes` as one write and persists it, if there's a
+            local_file. must be called with self.lock held.
+
+        :param changes: dict[path tuple] => (new_value, old_value)
+         :type changes: dict
+
+        :param save: (optional) rewrite local_file for it if there's no
+            journal. merges pass False: they're only persisted by a journal.
+         :type save: bool
+
+        :raises SchemaError
+            if there's a schema and the changes don't fit it (nothing's applied)
+        """
+        self.schema and self.schema.validate_changes(self.config, changes)
+        config = apply_changes(self.config, changes, self.copy_on_write)
+        self._publish(config, changes)
+
+        if not self.local_file:
+            return
+        if self._journal and self._journal.append(changes):
+            if self._journal.records >= self.journal_compact_every:
+                self._save_soon()
+        elif save:
+            self._save_soon()
+
+    @staticmethod
+    def load_from_file(file_path, file_formatter, logger=None, cache_path=None):
+        """
+        :param file_path: path to a local file to load into self.config
+         :type file_path: str
+
+        :param file_formatter: formatter of that file
+         :type file_formatter: utils.configuration.Formatter
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+
+        :param cache_path: (optional) where to keep a binary snapshot of the
+            parsed file, used instead of parsing while the file is unchanged
+         :type cache_path: str
+
+         :return dict
+        """
+        if not file_path:
+            return {}
+
+        filename = os.path.basename(file_path)
+        name, ext = os.path.splitext(filename)
+
+        if file_formatter.get_fmt() != ext:
+            # TODO:  maybe do something when chosen formatter != extension of local file
+            pass
+
+        try:
+            with open(file_path, 'rb') as input_file:
+                logger and logger.info('loaded config at {}', file_path)
+                if cache_path:
+                    return load_through_cache(input_file, file_formatter,
+                                              cache_path, logger=logger)
+                return file_formatter.load(input_file)
+        except IOError:
+            if logger is not None:
+                logger.error('couldnt open file at {}. no config loaded.', file_path)
+            return {}
+
+    def save(self):
+        """
+            saves the state config to the local file. thread-safe
+
+            with a config_dir, only what differs from its fragments is
+            saved (a key removed from one can't be, and comes back on load).
+        """
+        if self.local_file:
+            started = self.metrics and self.metrics.clock()
+            with self.lock:
+                config = self.config
+                if self._fragments is not None:
+                    config = difference(self._fragments.load(), config)
+                Configurable.save_to_file(config,
+                                          self.local_file,
+                                          self.local_file_formatter,
+                                          logger=self.logger)
+                if self._journal:
+                    self._journal.clear()
+                if self._watcher:
+                    self._watcher.mark_seen()
+            self.metrics and self.metrics.observe('save', started)
+
+    def flush(self):
+        """
+            saves any writes still waiting on the background saver (see
+            save_delay). without save_delay there's never anything waiting.
+        """
+        if self._write_behind:
+            self._write_behind.flush()
+
+    def _save_soon(self):
+        if self._write_behind:
+            self._write_behind.mark_dirty()
+        else:
+            self.save()
+
+    @staticmethod
+    def save_to_file(config, file_path, file_formatter, logger=None):
+        """
+        :param config: the configuration dict you'd like to write
+         :type config: dict
+
+        :param file_path: path to a local file to load into self.config
+         :type file_path: str
+
+        :param file_formatter: formatter of that file
+         :type file_formatter: utils.configuration.Formatter
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+        """
+        filename = os.path.basename(file_path)
+        name, ext = os.path.splitext(filename)
+
+        if file_formatter.get_fmt() != ext:
+            # TODO: do something when chosen formatter != extension of local file
+            logger and logger.warning('format name doesnt match file extension')
+            pass
+
+        # write next to the file and rename over it, so that nobody
+        # (other processes, a watcher) ever reads a half-written file.
+        temp_path = '{}.{}.{}.tmp'.format(file_path, os.getpid(), current_thread().ident)
+        try:
+            with open(temp_path, 'wb') as output_file:
+                file_formatter.dump(config, output_file)
+            if os.path.exists(file_path):
+                os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+            os.rename(temp_path, file_path)
+            logger and logger.info('saved to {}.', file_path)
+        except (IOError, OSError):
+            logger and logger.error('failed to save to {}', file_path)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def __getitem__(self, item):
+        """
+        note: this function checks if it's in the consumed config and tries to
+              return that, if not found in your current config. the flask
+              layer holds it as it was when attached; this also sees what's
+              written into it since. get does the same.
+
+        note: `item` can be a '.'-notation path: config['mysql.host'] is
+              config['mysql']['host'] (unless there's a key 'mysql.host').
+        """
+        try:
+            return self._lookup(item)
+        except KeyError as key_error:
+            if self._config:
+                return self._config[item]
+            raise key_error
+
+    def get(self, item, default=None):
+        try:
+            return self[item]
+        except KeyError:
+            return default
+
+    def _lookup(self, item):
+        """
+            self.config[item], where `item` may be a '.'-notation path.
+
+            a path is split once, and what it found is remembered until the
+            next write, so looking it up again is a single dict hit.
+        """
+        if self.metrics is not None:
+            self.metrics.saw_key(item)
+        if self._shared is not None and self._shared.generation() != self._shared_generation:
+            self._pull_shared()
+
+        layers = self._layers
+        if layers is None:
+            version = self.version
+            config = self.config
+        else:
+            version = (self.version, self._layers_version)
+            config = layers.view
+        if not isinstance(item, STRING_TYPES) or '.' not in item or item in config:
+            return config[item]
+
+        lookups = self._lookups
+        if lookups[0] != version:
+            lookups = self._lookups = (version, {})
+        value = lookups[1].get(item, MISSING)
+        if value is not MISSING:
+            return value
+
+        keys = self._keys_of(item, config)
+        value = config
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                raise KeyError(item)
+            value = value[key]
+        lookups[1][item] = value
+        return value
+
+    def _keys_of(self, item, config):
+        """
+        :returns tuple
+            the keys `item` leads through: ('a.b',) if there's a key 'a.b'
+            in `config`, otherwise ('a', 'b')
+        """
+        if not isinstance(item, STRING_TYPES) or '.' not in item or item in config:
+            return (item,)
+        keys = self._path_keys.get(item)
+        if keys is None:
+            if len(self._path_keys) >= _MAX_PATH_KEYS:
+                self._path_keys = {}
+            keys = self._path_keys[item] = tuple(item.split('.'))
+        return keys
+
+    def __eq__(self, other):
+        if isinstance(other, Configurable):
+            if self._hashes is not None and other._hashes is not None:
+                return self.config_hash() == other.config_hash()
+            other = other.config
+        return self.config.__eq__(other)
+
+    def __repr__(self):
+        return json.dumps(self.config)
+
+    def __setitem__(self, key, value):
+        with self._writing():
+            self._commit({(key,): (value, self.config.get(key, MISSING))})
+
+    def __call__(self, environ, start_response):
+        """
+        :param environ: a WSGI environ bundle
+         :type environ: dict
+
+        :param start_response: something
+         :type start_response: flask.Response
+        """
+        if environ['PATH_INFO'].startswith(self._prefix):
+            return self._conf_app(environ, start_response)
+        return self._wsgi_app(environ, start_response)
+
+
+def _set_change(changes, config, path, value):
+    """
+        records setting `path` to `value` in `config` in `changes`: at the
+        path itself, or at the first key on the way that's missing (or not
+        a dict) with `value` nested in what replaces it.
+    """
+    node = config
+    for depth in range(len(path) - 1):
+        prefix = path[:depth + 1]
+        if prefix in changes:
+            # made by an earlier path of the same write: set it in there
+            node = changes[prefix][0]
+            for key in path[depth + 1:-1]:
+                child = node.get(key)
+                if not isinstance(child, dict):
+                    child = node[key] = {}
+                node = child
+            node[path[-1]] = value
+            return
+        child = node.get(path[depth], MISSING)
+        if not isinstance(child, dict):
+            for key in reversed(path[depth + 1:]):
+                value = {key: value}
+            changes[prefix] = (value, child)
+            return
+        node = child
+    current = node.get(path[-1], MISSING)
+    if current is MISSING or current != value:
+        changes[path] = (value, current)
@@ -0,0 +1,206 @@
+"""
+    Configurable for asyncio (python 3.5+).
+
+    reads (config[key], get(), serving a cached /config/) never block, so
+    they're fine on the event loop as they are. what does block (parsing,
+    serializing, file I/O, waiting on config.lock) is sent to an executor.
+"""
+import asyncio
+import functools
+import weakref
+
+from configurable import Configurable
+from configurable.web import Request, Response
+
+
+class AsyncConfigurable(Configurable):
+    def __init__(self, *args, **kwargs):
+        """
+        A Configurable with awaitable writes, and an ASGI counterpart of the
+        /config/ interception (see asgi_middleware).
+
+        takes the same arguments as Configurable, plus:
+
+        :param executor: (optional) where the blocking work runs
+            default: None (the loop's default executor)
+         :type executor: concurrent.futures.Executor
+        """
+        self.executor = kwargs.pop('executor', None)
+        self._async_locks = weakref.WeakKeyDictionary()  # loop => asyncio.Lock
+        super(AsyncConfigurable, self).__init__(*args, **kwargs)
+
+    async def load_async(self):
+        """
+            load(), without blocking the event loop.
+        """
+        return await self._run_locked(self.load)
+
+    async def save_async(self):
+        """
+            save(), without blocking the event loop.
+        """
+        return await self._run_locked(self.save)
+
+    async def merge_in_dict_async(self, dict_to_merge):
+        """
+            merge_in_dict(), without blocking the event loop.
+        """
+        return await self._run_locked(self.merge_in_dict, dict_to_merge)
+
+    async def flush_async(self):
+        return await self._run(self.flush)
+
+    def asgi_middleware(self, application):
+        """
+            wraps an ASGI application so that /config/ is served from here,
+            the way attach_to_flask_app does for a WSGI one.
+
+        :param application: the ASGI (3.0) application to wrap
+         :type application: callable
+
+        :returns callable
+            the ASGI application to serve instead
+        """
+        return _ConfigMiddleware(self, application)
+
+    def _async_lock(self):
+        """
+            the asyncio.Lock async writers queue on. one per event loop: an
+            asyncio.Lock can't be shared between loops.
+        """
+        loop = asyncio.get_event_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            lock = self._async_locks[loop] = asyncio.Lock()
+        return lock
+
+    async def _run_locked(self, function, *args):
+        # waiting on each other happens on the loop, and only one of this
+        # loop's writers at a time occupies an executor thread (waiting on
+        # self.lock there, if a thread is writing).
+        async with self._async_lock():
+            return await self._run(function, *args)
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args))
+
+
+class _ConfigMiddleware(object):
+    def __init__(self, conf_api, application):
+        self.conf_api = conf_api
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.conf_api.routes.prefix):
+            return await self.application(scope, receive, send)
+
+        body = []
+        while True:
+            message = await receive()
+            body.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        # HEAD is answered as GET, without the body, as WSGIResponder does
+        method = scope['method']
+        request = Request('GET' if method == 'HEAD' else method, scope['path'],
+                          query_string=scope.get('query_string', b'').decode('latin-1'),
+                          headers=dict((name.decode('latin-1').lower(), value.decode('latin-1'))
+                                       for name, value in scope.get('headers', ())),
+                          body=b''.join(body))
+
+        conf_api = self.conf_api
+        routes = conf_api.routes
+        serialized = conf_api._serialized
+        if request.path == routes.prefix + 'watch' and request.method == 'GET':
+            return await self._watch(request, receive, send)
+        if (request.method == 'GET' and request.path == routes.prefix and
+                not request.query_string and conf_api._shared is None and
+                serialized and serialized[0] == conf_api.version):
+            # the whole config, cached: nothing to serialize, nothing blocks.
+            # everything else may take the lock (or unpickle a snapshot)
+            response = routes.handle(request)
+        else:
+            response = await conf_api._run(routes.handle, request)
+        await self._start(send, response)
+        await send({'type': 'http.response.body',
+                    'body': b'' if method == 'HEAD' else response.body})
+
+    async def _watch(self, request, receive, send):
+        """
+            /config/watch, waiting on the event loop instead of a thread.
+        """
+        conf_api = self.conf_api
+        routes = conf_api.routes
+        try:
+            since, timeout, stream = routes.watch_params(request)
+        except ValueError as value_error:
+            response = Response(str(value_error), status=400, content_type='text/plain')
+            await self._start(send, response)
+            return await send({'type': 'http.response.body', 'body': response.body})
+
+        if not stream:
+            await wait_for_version(conf_api.notifier, since, timeout)
+            response = Response((await conf_api._run(routes.changes_body, since))[1])
+            await self._start(send, response)
+            return await send({'type': 'http.response.body', 'body': response.body})
+
+        await self._start(send, Response(content_type='text/event-stream',
+                                         headers=[('Cache-Control', 'no-cache')]))
+        await send({'type': 'http.response.body', 'body': b': watching\n\n',
+                    'more_body': True})
+        # the only thing the client can still send is that it's gone
+        disconnected = asyncio.ensure_future(receive())
+        try:
+            while True:
+                changed = asyncio.ensure_future(
+                    wait_for_version(conf_api.notifier, since, timeout))
+                await asyncio.wait([changed, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    changed.cancel()
+                    return
+                if changed.result() <= since:
+                    event = b': still watching\n\n'
+                else:
+                    since, event = await conf_api._run(routes.event, since)
+                await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def _start(send, response):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers],
+        })
+
+
+async def wait_for_version(notifier, version, timeout):
+    """
+        VersionNotifier.wait(), for the event loop: waits (without a thread)
+        until the config is past `version` or `timeout` seconds went by.
+
+    :returns int
+        the version the config is at
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def resolve(new_version):
+        loop.call_soon_threadsafe(_set_result, future, new_version)
+
+    handle = notifier.call_after(version, resolve)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return notifier.version
+    finally:
+        notifier.cancel(handle)
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
@@ -0,0 +1,192 @@
+import copy
+
+# marks a key that isn't (or is no longer) in the config
+MISSING = object()
+
+try:
+    STRING_TYPES = basestring
+except NameError:  # python 3
+    STRING_TYPES = str
+
+
+def merge_changes(current, incoming, path, changes):
+    """
+        works out what merging `incoming` into `current` would change,
+        without changing anything. values that are already there (equal)
+        aren't changes.
+
+    :param current: the dict being merged into
+     :type current: dict
+
+    :param incoming: the dict being merged in
+     :type incoming: dict
+
+    :param path: the keys leading to `current` (used as a stack)
+     :type path: list
+
+    :param changes: where the changes get recorded
+     :type changes: dict
+
+    :returns dict
+        dict[path tuple] => (new_value, old_value)
+        - old_value is MISSING if the key didn't exist
+    """
+    for k, v in incoming.items():
+        path.append(k)
+        old_value = current.get(k, MISSING)
+        if isinstance(v, dict) and isinstance(old_value, dict):
+            merge_changes(old_value, v, path, changes)
+        elif old_value is MISSING or old_value != v:
+            changes[tuple(path)] = (v, old_value)
+        path.pop()
+    return changes
+
+
+def diff_changes(current, new, path, changes):
+    """
+        works out the changes that turn `current` into `new`. subtrees that
+        are the same object in both are skipped without looking inside.
+
+    :param current: the dict as it is
+     :type current: dict
+
+    :param new: the dict as it should be
+     :type new: dict
+
+    :param path: the keys leading to `current` (used as a stack)
+     :type path: list
+
+    :param changes: where the changes get recorded
+     :type changes: dict
+
+    :returns dict
+        dict[path tuple] => (new_value, old_value)
+        - new_value is MISSING for keys only in `current`
+        - old_value is MISSING for keys only in `new`
+    """
+    for k, v in new.items():
+        old_value = current.get(k, MISSING)
+        if old_value is v:
+            continue
+        path.append(k)
+        if isinstance(v, dict) and isinstance(old_value, dict):
+            diff_changes(old_value, v, path, changes)
+        elif old_value is MISSING or old_value != v:
+            changes[tuple(path)] = (v, old_value)
+        path.pop()
+
+    for k, old_value in current.items():
+        if k not in new:
+            changes[tuple(path) + (k,)] = (MISSING, old_value)
+    return changes
+
+
+def apply_changes(config, changes, copy_on_write):
+    """
+        sets every changed path to its new value (removing it if that's MISSING).
+        every path's parent has to exist already.
+
+        with copy_on_write, `config` is left alone: only the dicts on the
+        way to a change get copied (once each) and the new root is returned,
+        everything else is shared with `config`.
+
+    :param config: the config to apply the changes to
+     :type config: dict
+
+    :param changes: dict[path tuple] => (new_value, old_value)
+     :type changes: dict
+
+    :param copy_on_write: whether to leave `config` untouched
+     :type copy_on_write: bool
+
+    :returns dict
+        the changed config
+    """
+    if copy_on_write:
+        config = dict(config)
+        copies = {(): config}
+
+    for path, (new_value, _) in changes.items():
+        node = config
+        for depth in range(1, len(path)):
+            if copy_on_write:
+                parent, node = node, copies.get(path[:depth])
+                if node is None:
+                    node = dict(parent[path[depth - 1]])
+                    parent[path[depth - 1]] = node
+                    copies[path[:depth]] = node
+            else:
+                node = node[path[depth - 1]]
+
+        if new_value is MISSING:
+            node.pop(path[-1], None)
+        elif copy_on_write:
+            # the caller still holds new_value, and a snapshot must not change
+            node[path[-1]] = copy.deepcopy(new_value)
+        else:
+            node[path[-1]] = new_value
+    return config
+
+
+def flatten_changes(changes):
+    """
+    :param changes: dict[path tuple] => (new_value, old_value)
+     :type changes: dict
+
+    :returns dict
+        dict[flattened_path] => (new_value, old_value)
+        - MISSING values become None
+    """
+    flattened = {}
+    for path, (new_value, old_value) in changes.items():
+        flattened[flatten_path(path)] = (None if new_value is MISSING else new_value,
+                                     None if old_value is MISSING else old_value)
+    return flattened
+
+
+def flatten_path(path):
+    """
+    :returns str
+        the '.'-notation of a path tuple. keys that aren't strings (a yaml
+        file's ints, say) are written as str() of them.
+    """
+    return '.'.join(key if isinstance(key, STRING_TYPES) else str(key) for key in path)
+
+
+def compose_patches(patches):
+    """
+        folds patches into one dict to merge_in_dict, as if they had been
+        merged one after the other: nested dicts combine, anything else
+        set later wins.
+
+        keys in '.'-notation are paths: {'mysql.host': 'db'} is
+        {'mysql': {'host': 'db'}}.
+
+    :param patches: the patches, in the order they should apply
+     :type patches: list of dict
+
+    :returns dict
+    """
+    composed = {}
+    for patch in patches:
+        _compose(composed, patch)
+    return composed
+
+
+def _compose(into, patch):
+    for k, v in patch.items():
+        keys = k.split('.') if isinstance(k, STRING_TYPES) else [k]
+        node = into
+        for key in keys[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+
+        if isinstance(v, dict):
+            child = node.get(keys[-1])
+            if not isinstance(child, dict):
+                child = node[keys[-1]] = {}
+            _compose(child, v)
+        else:
+            node[keys[-1]] = v
@@ -0,0 +1,209 @@
+import glob
+import os
+from multiprocessing.pool import ThreadPool
+
+from configurable.changes import MISSING, STRING_TYPES
+from formatting import FormatFactory
+
+# the key that pulls other files into the dict it's in
+INCLUDE = '!include'
+
+
+class Fragments(object):
+    def __init__(self, directory, workers=4, logger=None):
+        """
+        A conf.d directory: every file in it with a known extension (see
+        FormatFactory.EXTENSIONS) is a fragment of the config, and they're
+        merged in the order of their names (so 10-base.yml comes before
+        20-site.yml, and wins nothing against it). dicts merge, anything
+        else in a later fragment replaces what was there, as in
+        merge_in_dict.
+
+        a dict with an '!include' key (a path or a glob, or a list of them,
+        relative to the file it's in) gets those files merged into it, under
+        its own keys:
+
+            "!include": [db.yml, pools/*.yml]
+            mysql: {port: 3307}
+
+        each file's parse is kept along with its mtime, size and inode, so
+        loading again only parses the files that changed. those are parsed
+        on a pool of `workers` threads.
+
+        :param directory: the conf.d directory
+         :type directory: str
+
+        :param workers: (optional) threads to parse with
+         :type workers: int
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+        """
+        self.directory = directory
+        self.workers = workers
+        self.logger = logger
+        self.parses = 0  # files parsed, ever
+
+        self._cache = {}  # path => (signature, parsed)
+        self._used = set()  # the paths the last load() read
+
+    def paths(self):
+        """
+        :returns list
+            the fragments in the directory, in the order they merge
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            self.logger and self.logger.error('couldnt list {}. no fragments loaded.',
+                                              self.directory)
+            return []
+        return [os.path.join(self.directory, name) for name in sorted(names)
+                if not name.startswith('.') and
+                os.path.splitext(name)[1].lower() in FormatFactory.EXTENSIONS]
+
+    def load(self):
+        """
+        :returns dict
+            every fragment merged into one (a new dict each time: it shares
+            no dict with the parses kept)
+
+        :raises ValueError
+            if a file includes itself (through whatever others)
+        """
+        paths = self.paths()
+        stale = []
+        self._used = set()  # the paths known to be up to date in the cache
+        for path in paths:
+            signature = _signature(path)
+            if signature is None:
+                continue
+            cached = self._cache.get(path)
+            if cached is None or cached[0] != signature:
+                stale.append((path, signature, FormatFactory.for_path(path)))
+            self._used.add(path)
+
+        if len(stale) > 1 and self.workers > 1:
+            pool = ThreadPool(min(self.workers, len(stale)))
+            try:
+                parsed = pool.map(_parse, [(path, formatter) for path, _, formatter in stale])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            parsed = [_parse((path, formatter)) for path, _, formatter in stale]
+        for (path, signature, _), value in zip(stale, parsed):
+            self._store(path, signature, value)
+
+        config = {}
+        for path in paths:
+            merge_into(config, self._fragment(path, ()))
+        # forget the files that are gone, or no longer included
+        self._cache = dict((path, self._cache[path]) for path in self._used)
+        return config
+
+    def _fragment(self, path, including):
+        """
+        :returns dict
+            a copy of the file's dicts, with what they include merged in
+
+        :param including: the files that led here
+         :type including: tuple
+        """
+        if path in including:
+            raise ValueError('{} includes itself: {}'.format(
+                path, ' -> '.join(including + (path,))))
+        if path in self._used:
+            cached = self._cache[path]
+        else:
+            # an included file, or one that went away since it was listed
+            signature = _signature(path)
+            cached = self._cache.get(path)
+            if cached is None or cached[0] != signature:
+                cached = self._store(path, signature, _parse((path, FormatFactory.for_path(path)))
+                                     if signature is not None else MISSING)
+            self._used.add(path)
+        if not isinstance(cached[1], dict):
+            self.logger and self.logger.error('couldnt load a dict from {}. skipped.', path)
+            return {}
+        return self._expand(cached[1], os.path.dirname(path), including + (path,))
+
+    def _expand(self, value, directory, including):
+        if not isinstance(value, dict):
+            return value
+        expanded = {}
+        includes = value.get(INCLUDE)
+        if includes is not None:
+            for pattern in [includes] if isinstance(includes, STRING_TYPES) else includes:
+                paths = sorted(glob.glob(os.path.join(directory, pattern)))
+                if not paths:
+                    self.logger and self.logger.warning('{} includes {}, which matches nothing',
+                                                        including[-1], pattern)
+                for path in paths:
+                    merge_into(expanded, self._fragment(path, including))
+        for key, child in value.items():
+            if key != INCLUDE:
+                merge_into(expanded, {key: self._expand(child, directory, including)})
+        return expanded
+
+    def _store(self, path, signature, value):
+        if value is not MISSING:
+            self.parses += 1
+        cached = self._cache[path] = (signature, value)
+        return cached
+
+
+def _signature(path):
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+    return stats.st_mtime, stats.st_size, stats.st_ino
+
+
+def _parse(path_and_formatter):
+    path, formatter = path_and_formatter
+    try:
+        with open(path, 'rb') as input_file:
+            # an empty yaml file is None
+            return formatter.load(input_file) or {}
+    except IOError:
+        return MISSING
+
+
+def merge_into(into, value):
+    """
+        merges `value` into `into` as merge_in_dict would. `value`'s dicts
+        end up in `into` as they are, so it should be a fresh copy.
+
+    :returns dict
+        into
+    """
+    for key, child in value.items():
+        current = into.get(key)
+        if isinstance(child, dict) and isinstance(current, dict):
+            merge_into(current, child)
+        else:
+            into[key] = child
+    return into
+
+
+def difference(base, config):
+    """
+        what to merge into `base` (as merge_into does) to get `config`: the
+        keys whose values differ, recursing into dicts on both sides. a key
+        only `base` has can't be taken away that way, so it's left out.
+
+    :returns dict
+        shares its values with `config`
+    """
+    changed = {}
+    for key, value in config.items():
+        below = base.get(key, MISSING)
+        if isinstance(value, dict) and isinstance(below, dict):
+            value = difference(below, value)
+            if value:
+                changed[key] = value
+        elif value != below or type(value) is not type(below):
+            changed[key] = value
+    return changed
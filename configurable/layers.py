@@ -0,0 +1,179 @@
+import os
+
+from configurable.changes import MISSING, diff_changes
+
+
+class Layers(object):
+    def __init__(self):
+        """
+        Named dicts stacked on top of each other (later ones win), and the
+        view of them all merged into one, kept up to date as they change.
+
+        the view is built once, and after that only the paths a change
+        touched are resolved again (copying just the dicts on the way to
+        them: the view shares everything else with the layers). reading it
+        is a plain dict lookup, however many layers there are.
+
+        a dict in a higher layer is merged into the one under it; anything
+        else replaces what's under it, dicts included.
+        """
+        self.names = []
+        self.values = []
+        self.view = {}
+
+    def insert(self, index, name, values):
+        self.names.insert(index, name)
+        self.values.insert(index, values)
+        self.view = self.resolve(())
+
+    def replace(self, name, values, paths=None):
+        """
+        :param name: the layer
+         :type name: str
+
+        :param values: what's in it now
+         :type values: dict
+
+        :param paths: (optional) the paths that changed in it, if known
+         :type paths: iterable of tuple
+        """
+        index = self.names.index(name)
+        if paths is None:
+            paths = diff_changes(self.values[index], values, [], {})
+        self.values[index] = values
+        self.rebuild(paths)
+
+    def rebuild(self, paths):
+        """
+            resolves the view again at every one of `paths`.
+        """
+        view = self.view
+        paths = set(self._settable(view, path) for path in paths)
+        if not paths:
+            return
+        copies = {(): dict(view)}
+        view = copies[()]
+        # shallow first: once a path is set (maybe to a layer's own dict),
+        # the paths under it copy their way down from there
+        for path in sorted(paths, key=len):
+            value = self.resolve(path)
+            node = view
+            for depth in range(1, len(path)):
+                parent, node = node, copies.get(path[:depth])
+                if node is None:
+                    node = dict(parent[path[depth - 1]])
+                    parent[path[depth - 1]] = node
+                    copies[path[:depth]] = node
+            if value is MISSING:
+                node.pop(path[-1], None)
+            else:
+                node[path[-1]] = value
+        self.view = view
+
+    def resolve(self, path):
+        """
+        :returns object
+            what the view has at `path` (MISSING if nothing)
+        """
+        nodes, start = self._nodes(path)
+        result = MISSING
+        for node in nodes[start:]:
+            if node is MISSING:
+                continue
+            if isinstance(node, dict) and isinstance(result, dict):
+                result = _merge(result, node)
+            else:
+                result = node
+        return result
+
+    def source_of(self, path):
+        """
+        :returns str
+            the name of the highest layer with something at `path` that
+            shows in the view (for a merged dict, the highest of those
+            merged), None if there's nothing there
+        """
+        nodes, start = self._nodes(path)
+        for index in range(len(nodes) - 1, start - 1, -1):
+            if nodes[index] is not MISSING:
+                return self.names[index]
+        return None
+
+    def _nodes(self, path):
+        """
+        :returns tuple
+            (each layer's value at `path` or MISSING, the index of the lowest
+            layer that isn't hidden under something that's not a dict)
+        """
+        nodes = list(self.values)
+        start = 0
+        for key in path:
+            for index in range(len(nodes) - 1, start - 1, -1):
+                if nodes[index] is not MISSING and not isinstance(nodes[index], dict):
+                    start = index + 1
+                    break
+            nodes = [node.get(key, MISSING) if isinstance(node, dict) else MISSING
+                     for node in nodes]
+        return nodes, start
+
+    @staticmethod
+    def _settable(view, path):
+        """
+        :returns tuple
+            `path`, or the shortest part of it whose parent isn't a dict in
+            the view: what has to be resolved to take in a change at `path`
+        """
+        node = view
+        for depth in range(len(path) - 1):
+            node = node.get(path[depth]) if isinstance(node, dict) else None
+            if not isinstance(node, dict):
+                return path[:depth + 1]
+        return path
+
+
+def environment_layer(prefix, environ=None, coerce=None):
+    """
+        the variables starting with `prefix`, as a config: MYAPP_MYSQL__HOST=db
+        (with prefix 'MYAPP_') is {'mysql': {'host': 'db'}}. names are
+        lowercased and '__' separates sections. values stay strings ('1.10'
+        is a version, not 1.1) unless `coerce` says otherwise.
+
+    :param prefix: what the variables start with
+     :type prefix: str
+
+    :param environ: (optional) default: os.environ
+     :type environ: dict
+
+    :param coerce: (optional) callable(keys, value) => the value to use, for
+        a tuple of keys and the variable's string (e.g. Schema.coerce)
+     :type coerce: callable
+
+    :returns dict
+    """
+    layer = {}
+    for name, value in (os.environ if environ is None else environ).items():
+        if not name.startswith(prefix) or len(name) == len(prefix):
+            continue
+        keys = name[len(prefix):].lower().split('__')
+        if coerce is not None:
+            value = coerce(tuple(keys), value)
+        node = layer
+        for key in keys[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+        node[keys[-1]] = value
+    return layer
+
+
+def _merge(lower, higher):
+    # shares every subtree only one side has
+    merged = dict(lower)
+    for key, value in higher.items():
+        below = merged.get(key, MISSING)
+        if isinstance(value, dict) and isinstance(below, dict):
+            merged[key] = _merge(below, value)
+        else:
+            merged[key] = value
+    return merged
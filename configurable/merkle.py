@@ -0,0 +1,115 @@
+import hashlib
+import json
+
+from configurable.changes import MISSING
+
+# a dict's hash is taken over the sum of its entries' hashes, modulo this
+_MODULUS = 1 << 160
+
+
+class MerkleHashes(object):
+    def __init__(self, config):
+        """
+        A content hash of every subtree of a config, kept up to date by the
+        change sets of its writes.
+
+        a dict's hash comes from the sum of one hash per (key, child's hash)
+        entry. a sum doesn't care about order, and an entry can be taken out
+        and put back in: a changed leaf updates each dict above it in O(1),
+        without looking at its siblings. only dicts' sums are stored; a
+        leaf's hash is the sha1 of its json.
+
+        hashes only depend on content, so they can be compared across
+        processes and hosts.
+
+        :param config: the config as it is now (hashed in full, once)
+         :type config: dict
+        """
+        self._sums = {}  # path tuple of a dict => sum of its entries
+        self._hash(config, ())
+
+    def root(self):
+        return self.digest(())
+
+    def digest(self, path):
+        """
+        :returns str
+            the hash of the dict at `path`
+        """
+        return hashlib.sha1(('d%x' % self._sums[path]).encode('ascii')).hexdigest()
+
+    def hash_of(self, value, path):
+        """
+        :returns str
+            the hash of `value`, which is at `path` in the config
+        """
+        if isinstance(value, dict):
+            return self.digest(path)
+        return _leaf(value)
+
+    def update(self, changes):
+        """
+            takes in a write. must be called with the config's lock held,
+            after the changes are applied.
+
+        :param changes: dict[path tuple] => (new_value, old_value), where no
+            path is under another (as merge_changes and diff_changes make them)
+         :type changes: dict
+        """
+        for path, (new_value, old_value) in changes.items():
+            old_hash = self._forget(old_value, path)
+            new_hash = None if new_value is MISSING else self._hash(new_value, path)
+
+            for depth in range(len(path), 0, -1):
+                parent = path[:depth - 1]
+                before = self.digest(parent)
+                total = self._sums[parent]
+                if old_hash is not None:
+                    total -= _entry(path[depth - 1], old_hash)
+                if new_hash is not None:
+                    total += _entry(path[depth - 1], new_hash)
+                self._sums[parent] = total % _MODULUS
+                old_hash, new_hash = before, self.digest(parent)
+
+    def _hash(self, value, path):
+        if not isinstance(value, dict):
+            return _leaf(value)
+        total = 0
+        for key, child in value.items():
+            total += _entry(key, self._hash(child, path + (key,)))
+        self._sums[path] = total % _MODULUS
+        return self.digest(path)
+
+    def _forget(self, value, path):
+        """
+            drops the sums of every dict in `value` (the old value at `path`).
+
+        :returns str
+            the hash it had, None if it was MISSING
+        """
+        if value is MISSING:
+            return None
+        if not isinstance(value, dict):
+            return _leaf(value)
+        digest = self.digest(path)
+        stack = [(path, value)]
+        while stack:
+            path, value = stack.pop()
+            self._sums.pop(path, None)
+            stack.extend((path + (key,), child) for key, child in value.items()
+                         if isinstance(child, dict))
+        return digest
+
+
+def _leaf(value):
+    return hashlib.sha1(b'l' + _json(value)).hexdigest()
+
+
+def _entry(key, child_hash):
+    return int(hashlib.sha1(_json(key) + b':' + child_hash.encode('ascii')).hexdigest(), 16)
+
+
+def _json(value):
+    # sort_keys: a leaf holding a dict in a list still has one json
+    encoded = json.dumps(value, sort_keys=True, default=repr)
+    return encoded if isinstance(encoded, bytes) else encoded.encode('utf-8')
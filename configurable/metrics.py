@@ -0,0 +1,210 @@
+import random
+from threading import Lock
+from timeit import default_timer
+
+# upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+           0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+
+class Metrics(object):
+    def __init__(self, hooks=None, key_sample_rate=16, hot_keys=10):
+        """
+        Counts and latency histograms of what a Configurable does (load,
+        save, merge, serve, ...), the time spent waiting on its lock, and
+        an estimate of which keys get read the most.
+
+        a Configurable without Metrics doesn't measure anything.
+
+        :param hooks: (optional) called as hook(name, seconds) for every
+            observation, to forward them to your own telemetry
+         :type hooks: list of callable
+
+        :param key_sample_rate: (optional) count one in this many key reads
+         :type key_sample_rate: int
+
+        :param hot_keys: (optional) how many of the most read keys to report
+         :type hot_keys: int
+        """
+        self.hooks = list(hooks or [])
+        self.clock = default_timer
+
+        self._histograms = {}
+        self._lock = Lock()
+        self._hot_keys = HotKeys(key_sample_rate, hot_keys)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def observe(self, name, started):
+        """
+            records that `name` took from `started` (a self.clock() reading)
+            until now.
+        """
+        seconds = self.clock() - started
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram()
+            histogram.add(seconds)
+
+        for hook in self.hooks:
+            hook(name, seconds)
+
+    def saw_key(self, key):
+        self._hot_keys.add(key)
+
+    def snapshot(self):
+        """
+        :returns dict
+            {
+                name: {'count': int, 'sum': float, 'buckets': [[le, count], ...]},
+                ...,
+                'hot_keys': [[key, estimated reads], ...]
+            }
+            bucket counts are cumulative, like prometheus', and the last
+            bucket's le is '+Inf'.
+        """
+        with self._lock:
+            snapshot = dict((name, histogram.snapshot())
+                            for name, histogram in self._histograms.items())
+        snapshot['hot_keys'] = self._hot_keys.top()
+        return snapshot
+
+    def prometheus(self, prefix='configurable'):
+        """
+        :returns str
+            the snapshot in prometheus' text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted(snapshot):
+            if name == 'hot_keys':
+                continue
+            metric = '{}_{}_seconds'.format(prefix, name)
+            lines.append('# TYPE {} histogram'.format(metric))
+            for le, count in snapshot[name]['buckets']:
+                lines.append('{}_bucket{{le="{}"}} {}'.format(
+                    metric, le if le == '+Inf' else repr(le), count))
+            lines.append('{}_sum {!r}'.format(metric, snapshot[name]['sum']))
+            lines.append('{}_count {}'.format(metric, snapshot[name]['count']))
+
+        metric = '{}_key_reads'.format(prefix)
+        lines.append('# TYPE {} gauge'.format(metric))
+        for key, reads in snapshot['hot_keys']:
+            lines.append('{}{{key="{}"}} {}'.format(metric, _escape_label(key), reads))
+        return '\n'.join(lines) + '\n'
+
+
+class TimedLock(object):
+    def __init__(self, lock, metrics, name='lock_wait'):
+        """
+        Wraps a lock to observe how long acquiring it takes.
+
+        :param lock: the lock to wrap
+         :type lock: threading.RLock
+
+        :param metrics: where to record the wait
+         :type metrics: Metrics
+        """
+        self._lock = lock
+        self._metrics = metrics
+        self._name = name
+
+    def acquire(self, blocking=True):
+        started = self._metrics.clock()
+        acquired = self._lock.acquire(blocking)
+        self._metrics.observe(self._name, started)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class HotKeys(object):
+    def __init__(self, sample_rate=16, top=10, width=1024, depth=4):
+        """
+        An estimate of the most read keys: one in `sample_rate` reads is
+        counted in a count-min sketch, and the keys with the highest counts
+        are kept track of.
+
+        only sampled reads take a lock. the count of reads itself isn't
+        locked: a read racing another may go unsampled, which an estimate
+        can live with.
+        """
+        self.sample_rate = sample_rate
+        self.top_size = top
+        self.width = width
+
+        self._seeds = [random.getrandbits(32) for _ in range(depth)]
+        self._rows = [[0] * width for _ in range(depth)]
+        self._reads = 0
+        self._candidates = {}  # key => estimated (sampled) reads
+        self._lock = Lock()
+
+    def add(self, key):
+        self._reads += 1
+        if self._reads % self.sample_rate:
+            return
+
+        with self._lock:
+            estimate = None
+            for seed, row in zip(self._seeds, self._rows):
+                column = hash((seed, key)) % self.width
+                row[column] += 1
+                if estimate is None or row[column] < estimate:
+                    estimate = row[column]
+
+            candidates = self._candidates
+            if key in candidates or len(candidates) < self.top_size * 2:
+                candidates[key] = estimate
+            else:
+                coldest = min(candidates, key=candidates.get)
+                if candidates[coldest] < estimate:
+                    del candidates[coldest]
+                    candidates[key] = estimate
+
+    def top(self):
+        """
+        :returns list
+            [[key, estimated reads], ...], most read first
+        """
+        with self._lock:
+            candidates = sorted(self._candidates.items(), key=lambda item: -item[1])
+        return [[key, estimate * self.sample_rate]
+                for key, estimate in candidates[:self.top_size]]
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, seconds):
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    def snapshot(self):
+        buckets, total = [], 0
+        for le, count in zip(BUCKETS, self.counts):
+            total += count
+            buckets.append(['+Inf' if le == float('inf') else le, total])
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
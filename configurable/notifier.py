@@ -0,0 +1,72 @@
+from itertools import count
+from threading import Condition, Lock
+from timeit import default_timer
+
+
+class VersionNotifier(object):
+    def __init__(self, version=0):
+        """
+        Tells whoever is waiting for the next version that it's here: threads
+        blocked in wait(), and callbacks (say, ones resolving an asyncio
+        future) registered with call_after().
+
+        one publish() wakes every waiter at once; waiters don't poll.
+
+        :param version: (optional) the version to start at
+         :type version: int
+        """
+        self.version = version
+        self._condition = Condition(Lock())
+        self._callbacks = {}  # handle => callback
+        self._handles = count(1)
+
+    def publish(self, version):
+        """
+            the config is now at `version`. wakes everyone waiting for it.
+        """
+        with self._condition:
+            self.version = version
+            self._condition.notify_all()
+            callbacks, self._callbacks = self._callbacks, {}
+        for callback in callbacks.values():
+            callback(version)
+
+    def wait(self, version, timeout):
+        """
+            blocks until the config is past `version`, or `timeout` seconds
+            went by.
+
+        :returns int
+            the version the config is at
+        """
+        deadline = default_timer() + timeout
+        with self._condition:
+            while self.version <= version:
+                remaining = deadline - default_timer()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self.version
+
+    def call_after(self, version, callback):
+        """
+            calls callback(new_version) once the config is past `version`:
+            right away if it already is, otherwise from the thread that
+            publishes the next version. keep it short.
+
+        :returns int
+            a handle to cancel() the call with (None if it was made already)
+        """
+        with self._condition:
+            if self.version <= version:
+                handle = next(self._handles)
+                self._callbacks[handle] = callback
+                return handle
+            current = self.version
+        callback(current)
+        return None
+
+    def cancel(self, handle):
+        if handle is not None:
+            with self._condition:
+                self._callbacks.pop(handle, None)
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import struct
+import time
+from threading import Condition, Thread
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from configurable.changes import MISSING
+from formatting import FormatFactory
+
+# every journal record is preceded by its length
+_RECORD_HEADER = struct.Struct('>I')
+
+
+class WriteBehind(object):
+    def __init__(self, save, delay=1.0, max_pending=None, logger=None):
+        """
+        Saves on a background thread instead of on the writer's.
+
+        writers call mark_dirty(), which only counts. the thread calls `save`
+        once `delay` seconds have passed since the first unsaved write, or
+        as soon as `max_pending` writes are waiting, whichever comes first.
+        every write in between shares that one save.
+
+        :param save: what to call to persist the config
+         :type save: callable
+
+        :param delay: (optional) the most seconds a write waits to be saved
+         :type delay: float
+
+        :param max_pending: (optional) save as soon as this many writes wait
+         :type max_pending: int
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+        """
+        self.save = save
+        self.delay = delay
+        self.max_pending = max_pending
+        self.logger = logger
+
+        self._condition = Condition()
+        self._pending = 0
+        self._dirty_since = None
+        self._closed = False
+
+        self._thread = Thread(target=self._run, name='configurable-write-behind')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def mark_dirty(self):
+        with self._condition:
+            if not self._pending:
+                self._dirty_since = time.time()
+            self._pending += 1
+            self._condition.notify()
+
+    def flush(self):
+        """
+            saves right away, if there's anything to save.
+        """
+        with self._condition:
+            pending, self._pending = self._pending, 0
+            self._dirty_since = None
+
+        if pending:
+            try:
+                self.save()
+            except Exception:
+                self.logger and self.logger.exception('write-behind save failed')
+
+    def close(self):
+        """
+            stops the background thread, saving what's still pending.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._should_save():
+                    if self._pending:
+                        self._condition.wait(self._dirty_since + self.delay - time.time())
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+    def _should_save(self):
+        if not self._pending:
+            return False
+        if self.max_pending and self._pending >= self.max_pending:
+            return True
+        return time.time() >= self._dirty_since + self.delay
+
+
+class Journal(object):
+    def __init__(self, path, logger=None):
+        """
+        An append-only log of the changes made since the config file was
+        last saved, so a write costs as much as what it changed rather than
+        a rewrite of the whole file.
+
+        every write is one record: a list of (path, new_value) for the paths
+        it set and (path,) for the paths it removed, pickled (so values come
+        back exactly as they went in) behind its length. a record that didn't
+        get fully written (say, we died mid-append) is where replay stops.
+
+        the journal is made 0600, and one that isn't owned by this user, or
+        that others can write to, is refused: unpickling it could run
+        anything.
+
+        :param path: where to keep the journal
+         :type path: str
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+        """
+        self.path = path
+        self.logger = logger
+        self.records = 0  # writes in the journal since it was last cleared
+
+        self._file = None
+
+    def append(self, changes):
+        """
+        :param changes: dict[path tuple] => (new_value, old_value)
+         :type changes: dict
+
+        :returns bool
+            False if the changes can't be pickled, in which case nothing was
+            appended and the whole config needs saving instead.
+
+        :raises ValueError
+            if the journal isn't ours alone
+        """
+        entries = []
+        for path, (new_value, _) in changes.items():
+            if new_value is MISSING:
+                entries.append((path,))
+            else:
+                entries.append((path, new_value))
+
+        try:
+            record = pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError):
+            return False
+
+        if self._file is None:
+            self._file = os.fdopen(
+                open_private(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT), 'ab')
+        self._file.write(_RECORD_HEADER.pack(len(record)) + record)
+        self._file.flush()
+        self.records += 1
+        return True
+
+    def replay(self, config):
+        """
+            applies every write in the journal to `config`, in place.
+
+        :param config: the config as it was last saved
+         :type config: dict
+
+        :returns bool
+            False if the journal ended in a partly written record
+
+        :raises ValueError
+            if the journal isn't ours alone
+        """
+        self.records = 0
+        try:
+            journal_file = os.fdopen(open_private(self.path, os.O_RDONLY), 'rb')
+        except (IOError, OSError):
+            return True
+        with journal_file:
+            while True:
+                header = journal_file.read(_RECORD_HEADER.size)
+                if not header:
+                    return True
+
+                record = b''
+                if len(header) == _RECORD_HEADER.size:
+                    length, = _RECORD_HEADER.unpack(header)
+                    record = journal_file.read(length)
+                if not record or len(record) != length:
+                    self.logger and self.logger.warning(
+                        'journal {} ends in a partial record.', self.path)
+                    return False
+
+                for entry in pickle.loads(record):
+                    _replay_entry(config, entry)
+                self.records += 1
+
+    def clear(self):
+        """
+            empties the journal. for once everything in it has been saved.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.records = 0
+
+
+def _replay_entry(config, entry):
+    path = entry[0]
+    node = config
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+
+    if len(entry) == 1:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = entry[1]
+
+
+def open_private(path, flags):
+    """
+        opens `path` (never through a symlink), making it 0600 if it's
+        created.
+
+    :returns int
+        the file descriptor
+
+    :raises ValueError
+        if the file isn't owned by this user, or others can write to it.
+        a pickle from someone else could run anything once loaded.
+    """
+    fd = os.open(path, flags | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    stats = os.fstat(fd)
+    if hasattr(os, 'getuid') and (stats.st_uid != os.getuid() or stats.st_mode & 0o022):
+        os.close(fd)
+        raise ValueError('{} has to be owned by this user and writable only by it'.format(path))
+    return fd
+
+
+def load_through_cache(input_file, file_formatter, cache_path, logger=None):
+    """
+        parses `input_file`, unless the binary snapshot at `cache_path` was
+        made from exactly this file (same mtime, size and contents), in which
+        case that's loaded instead. a missing or stale snapshot gets
+        (re)written after parsing. a snapshot that isn't ours alone (see
+        open_private) is parsed around, and replaced.
+
+    :param input_file: the config file, open for reading
+     :type input_file: file
+
+    :param file_formatter: formatter of that file
+     :type file_formatter: formatting.Formatter
+
+    :param cache_path: where the snapshot lives
+     :type cache_path: str
+
+    :param logger: (optional) a logger to write errors to
+     :type logger: logging.Logger
+
+    :returns dict
+    """
+    cache_formatter = FormatFactory.get_formatter('pickle')
+
+    source = input_file.read()
+    stat = os.fstat(input_file.fileno())
+    key = (stat.st_mtime, stat.st_size, hashlib.sha1(source).hexdigest())
+
+    try:
+        cache_file = os.fdopen(open_private(cache_path, os.O_RDONLY), 'rb')
+    except (IOError, OSError):
+        cache_file = None
+    except ValueError:
+        cache_file = None
+        logger and logger.warning('ignoring config cache at {}: not ours alone', cache_path)
+    if cache_file is not None:
+        try:
+            with cache_file:
+                cached_key, config = cache_formatter.load(cache_file)
+            if cached_key == key:
+                return config
+        except Exception:
+            logger and logger.warning('ignoring unreadable config cache at {}', cache_path)
+
+    config = file_formatter.loads(source)
+
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with os.fdopen(open_private(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+                       'wb') as cache_file:
+            cache_formatter.dump((key, config), cache_file)
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError, ValueError, pickle.PicklingError, TypeError):
+        logger and logger.warning('couldnt write config cache at {}', cache_path)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return config
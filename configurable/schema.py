@@ -0,0 +1,248 @@
+from configurable.changes import MISSING, STRING_TYPES, apply_changes, flatten_path
+
+
+class SchemaError(ValueError):
+    def __init__(self, errors):
+        """
+        :param errors: what's wrong: [(flattened_path, message), ...]
+         :type errors: list
+        """
+        self.errors = errors
+        super(SchemaError, self).__init__(
+            '; '.join('{}: {}'.format(path or '<root>', message) for path, message in errors))
+
+
+class Schema(object):
+    def __init__(self, rules):
+        """
+        What the config may hold, compiled once into a tree of rules indexed
+        by path.
+
+        a whole document (on load) is checked by walking the rules, not the
+        document: the cost is the size of the schema, plus the keys under a
+        '*'. a write is checked by walking down the rules along each path it
+        changed, so a one-key write costs about the depth of that key,
+        however big the config is.
+
+            Schema({
+                'mysql.host': {'type': str, 'required': True},
+                'mysql.port': {'type': int, 'min': 1, 'max': 65535},
+                'pools.*.size': {'type': int, 'min': 0},
+                'log_level': {'choices': ['debug', 'info', 'warning']},
+                'name': {'validator': lambda name: name.islower()},
+            })
+
+        :param rules: dict['.'-notation path] => rule, where '*' matches any
+            key. a rule is a dict of
+            - type: a type or a tuple of them. str means any string (unicode
+              too), float takes ints as well, and bools only pass as bool
+            - required: (default False) the path has to be there
+            - min, max: the value has to be >= min and <= max
+            - choices: the values it may have
+            - validator: callable(value) that returns something falsy, or
+              raises ValueError or TypeError, for a bad value. one on a
+              dict is run again on every write under it (with what the dict
+              would become), so it costs the size of that dict.
+         :type rules: dict
+        """
+        self._root = _Node()
+        for path, rule in rules.items():
+            node = self._root
+            for key in (path.split('.') if path else []):
+                node = node.child(key)
+            node.rule = _Rule(**rule)
+        self._root.compile()
+
+    def validate(self, config):
+        """
+        :raises SchemaError
+            if `config` (a whole document) doesn't fit
+        """
+        errors = []
+        self._root.check(config, (), errors)
+        if errors:
+            raise SchemaError(errors)
+
+    def validate_changes(self, config, changes):
+        """
+            checks what `config` would be with `changes` applied, looking
+            only at the changed paths (and at validators above them).
+
+        :param config: the config the changes apply to (left alone)
+         :type config: dict
+
+        :param changes: dict[path tuple] => (new_value, old_value), as
+            merge_changes and diff_changes make them
+         :type changes: dict
+
+        :raises SchemaError
+            if the changed config wouldn't fit
+        """
+        errors = []
+        containers = {}  # path => its nodes with a validator
+        for path, (new_value, _) in changes.items():
+            nodes = [self._root]
+            for depth, key in enumerate(path):
+                for node in nodes:
+                    if node.rule is not None and node.rule.validator is not None:
+                        containers.setdefault(path[:depth], []).append(node)
+                nodes = _children(nodes, key)
+                if not nodes:
+                    break
+            for node in nodes:
+                node.check(new_value, path, errors)
+
+        for path, nodes in containers.items():
+            value = _after(config, changes, path)
+            for node in nodes:
+                node.rule.run_validator(value, path, errors)
+        if errors:
+            raise SchemaError(errors)
+
+    def coerce(self, path, value):
+        """
+            turns a string (from the environment, say) into the bool, int or
+            float the rules at `path` ask for. 'true'/'false' and '1'/'0' are
+            bools.
+
+        :param path: the keys
+         :type path: tuple
+
+        :returns
+            the converted value, or `value` as it is if no rule asks for
+            one of those types or it doesn't convert
+        """
+        nodes = [self._root]
+        for key in path:
+            nodes = _children(nodes, key)
+        for node in nodes:
+            types = node.rule.types if node.rule is not None else ()
+            for each in (bool, int, float):
+                if each not in types:
+                    continue
+                try:
+                    return _CONVERTERS[each](value)
+                except ValueError:
+                    pass
+        return value
+
+
+def _to_bool(value):
+    try:
+        return {'true': True, '1': True, 'false': False, '0': False}[value.lower()]
+    except KeyError:
+        raise ValueError(value)
+
+
+_CONVERTERS = {bool: _to_bool, int: int, float: float}
+
+
+def _children(nodes, key):
+    # the rule nodes a key leads to from `nodes`: its own, and any '*'
+    children = []
+    for node in nodes:
+        child = node.children.get(key)
+        if child is not None:
+            children.append(child)
+        if node.wildcard is not None:
+            children.append(node.wildcard)
+    return children
+
+
+class _Node(object):
+    def __init__(self):
+        self.rule = None
+        self.children = {}
+        self.wildcard = None
+        self.required = False  # anything required at or under it
+
+    def child(self, key):
+        if key == '*':
+            if self.wildcard is None:
+                self.wildcard = _Node()
+            return self.wildcard
+        return self.children.setdefault(key, _Node())
+
+    def compile(self):
+        for child in self.children.values():
+            child.compile()
+        if self.wildcard is not None:
+            self.wildcard.compile()
+        # a '*' never matches under something missing, so it doesn't count
+        self.required = ((self.rule is not None and self.rule.required) or
+                         any(child.required for child in self.children.values()))
+
+    def check(self, value, path, errors):
+        if value is MISSING and not self.required:
+            return
+        if self.rule is not None:
+            self.rule.check(value, path, errors)
+        if not isinstance(value, dict):
+            value = {}
+        for key, child in self.children.items():
+            child.check(value.get(key, MISSING), path + (key,), errors)
+        if self.wildcard is not None:
+            for key, child_value in value.items():
+                self.wildcard.check(child_value, path + (key,), errors)
+
+
+class _Rule(object):
+    def __init__(self, type=None, required=False, min=None, max=None, choices=None,
+                 validator=None):
+        types = type if isinstance(type, tuple) else (type,) if type is not None else ()
+        self.type_names = ' or '.join(each.__name__ for each in types)
+        if str in types:
+            types += (STRING_TYPES,)
+        if float in types:
+            types += (int,)
+        self.types = types
+        self.required = required
+        self.minimum = min
+        self.maximum = max
+        self.choices = choices
+        self.validator = validator
+
+    def check(self, value, path, errors):
+        if value is MISSING:
+            if self.required:
+                errors.append((flatten_path(path), 'required'))
+            return
+        if self.types and (not isinstance(value, self.types) or
+                           (isinstance(value, bool) and bool not in self.types)):
+            errors.append((flatten_path(path), 'expected {}, got {}'.format(
+                self.type_names, value.__class__.__name__)))
+            return
+        try:
+            if self.minimum is not None and value < self.minimum:
+                errors.append((flatten_path(path), 'less than {}'.format(self.minimum)))
+            if self.maximum is not None and value > self.maximum:
+                errors.append((flatten_path(path), 'more than {}'.format(self.maximum)))
+        except TypeError:
+            errors.append((flatten_path(path), 'not comparable to its bounds'))
+        if self.choices is not None and value not in self.choices:
+            errors.append((flatten_path(path), 'not one of {}'.format(self.choices)))
+        self.run_validator(value, path, errors)
+
+    def run_validator(self, value, path, errors):
+        if self.validator is None:
+            return
+        try:
+            valid, message = self.validator(value), 'invalid'
+        except (ValueError, TypeError) as error:
+            valid, message = False, str(error) or 'invalid'
+        if not valid:
+            errors.append((flatten_path(path), message))
+
+
+def _after(config, changes, path):
+    """
+    :returns dict
+        the dict at `path` in `config` as it would be with `changes` applied
+        (copying only what's on the way to them)
+    """
+    value = config
+    for key in path:
+        value = value[key]
+    under = dict((('value',) + changed[len(path):], change) for changed, change in changes.items()
+                 if changed[:len(path)] == path)
+    return apply_changes({'value': value}, under, True)['value']
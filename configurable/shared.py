@@ -0,0 +1,140 @@
+import fcntl
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+# magic, generation, length of the payload that follows
+_HEADER = struct.Struct('>8sQQ')
+_MAGIC = b'CONFSHM1'
+_GENERATION = struct.Struct('>Q')
+_GENERATION_OFFSET = 8
+_LENGTH = struct.Struct('>Q')
+_LENGTH_OFFSET = 16
+
+
+class SharedRegion(object):
+    def __init__(self, path, capacity=1 << 20):
+        """
+        A memory-mapped file holding one payload (a serialized config) and
+        a generation that goes up every time it's replaced, so processes on
+        the same host can share one copy of it.
+
+        the generation is a seqlock: odd while a write is in progress. a
+        reader copies the payload and only keeps it if the generation was
+        even and the same before and after. writers take an flock() on the
+        file, so there's only ever one.
+
+        the payload is only ever read from a file this user owns and nobody
+        else can write to (it's unpickled): one made here is 0600, and one
+        found there with other owners or writers is refused.
+
+        :param path: the file to map. somewhere in /dev/shm keeps it in memory.
+         :type path: str
+
+        :param capacity: (optional) bytes to start with. grows as needed.
+         :type capacity: int
+
+        :raises ValueError
+            if the file isn't a shared config region, or someone else could
+            have written it
+        """
+        self.path = path
+        # O_NOFOLLOW: a symlink planted at path doesn't get us to write elsewhere
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        self._lock_depth = 0
+
+        stats = os.fstat(self._fd)
+        if stats.st_uid != os.getuid() or stats.st_mode & 0o022:
+            os.close(self._fd)
+            raise ValueError('{} has to be owned by this user and writable only by it'.format(path))
+
+        with self.locked():
+            if os.fstat(self._fd).st_size < _HEADER.size:
+                os.ftruncate(self._fd, max(capacity, mmap.PAGESIZE))
+                self._map()
+                _HEADER.pack_into(self._mmap, 0, _MAGIC, 0, 0)
+            else:
+                self._map()
+                if _HEADER.unpack_from(self._mmap, 0)[0] != _MAGIC:
+                    raise ValueError('{} is not a shared config region'.format(path))
+
+    def generation(self):
+        """
+            cheap: one read out of the mapping.
+        """
+        return _GENERATION.unpack_from(self._mmap, _GENERATION_OFFSET)[0]
+
+    def read(self):
+        """
+            call it from one thread at a time (say, under your own lock).
+
+        :returns tuple
+            (generation, payload). the payload is None if nothing has been
+            written yet.
+        """
+        while True:
+            # the generation first: a writer sets the length before it
+            # makes the generation even again.
+            generation = self.generation()
+            length = _LENGTH.unpack_from(self._mmap, _LENGTH_OFFSET)[0]
+            if generation % 2:
+                # a write is in progress: wait for the writer's flock
+                with self.locked():
+                    if self.generation() == generation:
+                        # and yet, no writer. it died halfway through.
+                        return generation, None
+                continue
+            if _HEADER.size + length > len(self._mmap):
+                # someone grew the file since we mapped it
+                self._map()
+                continue
+
+            payload = self._mmap[_HEADER.size:_HEADER.size + length]
+            if self.generation() == generation:
+                return generation, (payload if generation else None)
+
+    def write(self, payload):
+        """
+            replaces the payload. call with locked() held.
+
+        :returns int
+            the new generation
+        """
+        needed = _HEADER.size + len(payload)
+        if needed > len(self._mmap):
+            os.ftruncate(self._fd, max(needed, 2 * len(self._mmap)))
+            self._map()
+
+        generation = self.generation()
+        generation += generation % 2  # in case a writer died halfway through
+        _GENERATION.pack_into(self._mmap, _GENERATION_OFFSET, generation + 1)
+        self._mmap[_HEADER.size:needed] = payload
+        _LENGTH.pack_into(self._mmap, _LENGTH_OFFSET, len(payload))
+        _GENERATION.pack_into(self._mmap, _GENERATION_OFFSET, generation + 2)
+        return generation + 2
+
+    @contextmanager
+    def locked(self):
+        """
+            excludes writers in every other process (but not other threads
+            in this one, which is up to the caller). re-entrant.
+        """
+        if not self._lock_depth:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if not self._lock_depth:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _map(self):
+        # the old mapping isn't closed: threads calling generation() may
+        # still be using it. it goes away with its last reference.
+        self._mmap = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
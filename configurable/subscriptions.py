@@ -0,0 +1,123 @@
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+from threading import Lock, Thread
+
+from configurable.changes import flatten_changes
+
+
+class Subscriptions(object):
+    def __init__(self, workers=4, logger=None):
+        """
+        Listeners to changes under a path, kept in a trie of path segments.
+
+        telling them about a change set walks the trie along each changed
+        path, so it costs (changed paths x their depth), however many
+        listeners there are.
+
+        :param workers: (optional) threads that run background listeners
+            (started on the first background subscribe)
+         :type workers: int
+
+        :param logger: (optional) a logger to write listener errors to
+         :type logger: logging.Logger
+        """
+        self.workers = workers
+        self.logger = logger
+
+        self._root = _Node()
+        self._lock = Lock()  # guards the trie, not the listeners' calls
+        self._queue = None
+
+    def subscribe(self, prefix, callback, background=False):
+        """
+        :param prefix: '.'-notation path to listen under ('' for everything)
+         :type prefix: str
+
+        :param callback: called with dict[flattened_path] => (new_value, old_value)
+            of the changes under `prefix`, once per write
+         :type callback: callable
+
+        :param background: (optional) call it on a worker thread instead of
+            the writer's. background callbacks may run out of order.
+         :type background: bool
+        """
+        with self._lock:
+            node = self._root
+            for key in _split(prefix):
+                node = node.children.setdefault(key, _Node())
+            node.listeners.append((callback, background))
+
+            if background and self._queue is None:
+                self._queue = Queue()
+                for _ in range(self.workers):
+                    worker = Thread(target=self._work, name='configurable-subscriptions')
+                    worker.daemon = True
+                    worker.start()
+
+    def unsubscribe(self, prefix, callback):
+        with self._lock:
+            node = self._root
+            for key in _split(prefix):
+                node = node.children.get(key)
+                if node is None:
+                    return
+            node.listeners = [listener for listener in node.listeners
+                              if listener[0] != callback]
+
+    def notify(self, changes):
+        """
+        :param changes: dict[path tuple] => (new_value, old_value)
+         :type changes: dict
+        """
+        batches = {}
+        for path, change in changes.items():
+            node = self._root
+            node.collect(path, change, batches)
+            for key in path:
+                node = node.children.get(key)
+                if node is None:
+                    break
+                node.collect(path, change, batches)
+            else:
+                # `path` itself changed, and so did everything under it
+                stack = list(node.children.values())
+                while stack:
+                    node = stack.pop()
+                    node.collect(path, change, batches)
+                    stack.extend(node.children.values())
+
+        for (callback, background), batch in batches.values():
+            if background:
+                self._queue.put((callback, batch))
+            else:
+                self._call(callback, batch)
+
+    def _call(self, callback, batch):
+        try:
+            callback(flatten_changes(batch))
+        except Exception:
+            self.logger and self.logger.exception('config listener failed')
+
+    def _work(self):
+        while True:
+            callback, batch = self._queue.get()
+            self._call(callback, batch)
+
+
+class _Node(object):
+    __slots__ = ('children', 'listeners')
+
+    def __init__(self):
+        self.children = {}
+        self.listeners = []
+
+    def collect(self, path, change, batches):
+        for listener in self.listeners:
+            # keyed by id: callbacks needn't be hashable
+            batches.setdefault(id(listener), (listener, {}))[1][path] = change
+
+
+def _split(prefix):
+    return prefix.split('.') if prefix else []
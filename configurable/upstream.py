@@ -0,0 +1,239 @@
+import json
+import random
+import socket
+from threading import Event, Lock, Thread
+
+from configurable.schema import SchemaError
+
+try:
+    from httplib import HTTPConnection, HTTPException, HTTPSConnection
+    from urlparse import urlsplit
+except ImportError:  # python 3
+    from http.client import HTTPConnection, HTTPException, HTTPSConnection
+    from urllib.parse import urlsplit
+
+
+class UpstreamError(IOError):
+    pass
+
+
+class Upstream(object):
+    def __init__(self, conf_api, url, long_poll=True, interval=5.0, timeout=30.0,
+                 max_backoff=60.0, pool_size=2, logger=None):
+        """
+        Keeps `conf_api` in step with another Configurable's /config/ (the
+        upstream), on a background thread.
+
+        it fetches the whole config once, then only what changed since the
+        version it has: waiting on /config/watch with long_poll, otherwise
+        asking /config/?since= every `interval` seconds. what comes back is
+        written like any other write (one change set per response, so
+        listeners, saving and history all see it).
+
+        while the upstream can't be reached, the last config it sent stays
+        as it is, and it's tried again after a backoff that doubles (up to
+        `max_backoff` seconds) with every failure.
+
+        :param conf_api: the Configurable to keep in step
+         :type conf_api: configurable.Configurable
+
+        :param url: the upstream's config routes, e.g. http://central:5000/config/
+         :type url: str
+
+        :param long_poll: (optional) wait for changes instead of polling
+         :type long_poll: bool
+
+        :param interval: (optional) seconds between polls, and the first backoff
+         :type interval: float
+
+        :param timeout: (optional) seconds a long poll waits for a change
+         :type timeout: float
+
+        :param max_backoff: (optional) the longest wait after failures, in seconds
+         :type max_backoff: float
+
+        :param pool_size: (optional) idle connections to keep open
+         :type pool_size: int
+
+        :param logger: (optional) a logger to write failures to
+         :type logger: logging.Logger
+        """
+        parts = urlsplit(url)
+        self.conf_api = conf_api
+        self.prefix = '/' + parts.path.strip('/') + '/' if parts.path.strip('/') else '/'
+        self.long_poll = long_poll
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.logger = logger
+
+        self.version = None  # the upstream's, of what we have
+        self.etag = None
+        self.failures = 0  # in a row
+
+        self._pool = ConnectionPool(parts.scheme, parts.netloc, size=pool_size,
+                                    timeout=timeout + interval)
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name='configurable-upstream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def sync(self):
+        """
+            one round: gets what changed upstream since the version we
+            have (waiting for it, with long_poll) and writes it.
+
+        :returns dict
+            dict[flattened_path] => (new_value, old_value) of what changed here
+        """
+        if self.version is None:
+            return self._sync_all()
+
+        if self.long_poll:
+            path = '{}watch?since={}&timeout={}'.format(self.prefix, self.version, self.timeout)
+        else:
+            path = '{}?since={}'.format(self.prefix, self.version)
+        _, _, body = self._get(path)
+
+        document = json.loads(body.decode('utf-8'))
+        if 'config' in document:
+            changes = self.conf_api._commit_diff(document['config'])
+        else:
+            changes = self.conf_api._commit_paths(document['changes'], document['removed'],
+                                                  document.get('keys'))
+        self.version = document['version']
+        return changes
+
+    def stop(self):
+        self._stopped.set()
+        # wakes a long poll up: its connection goes away under it
+        self._pool.close()
+        self._thread.join()
+
+    def _sync_all(self):
+        headers = {'If-None-Match': '"{}"'.format(self.etag)} if self.etag else {}
+        status, response_headers, body = self._get(self.prefix, headers)
+        if status == 304:
+            return {}
+        changes = self.conf_api._commit_diff(json.loads(body.decode('utf-8')))
+        self.version = int(response_headers.get('x-config-version', 0))
+        self.etag = response_headers.get('etag', '').strip('"') or None
+        return changes
+
+    def _get(self, path, headers=None):
+        """
+        :returns tuple
+            (status, dict[lowercase header] => value, body)
+
+        :raises UpstreamError
+            if it's not a 200 (or a 304)
+        """
+        connection = self._pool.acquire()
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            body = response.read()
+        except Exception:
+            self._pool.discard(connection)
+            raise
+
+        response_headers = dict((name.lower(), value) for name, value in response.getheaders())
+        if response.will_close:
+            self._pool.discard(connection)
+        else:
+            self._pool.release(connection)
+        if response.status not in (200, 304):
+            raise UpstreamError('upstream answered {} to {}'.format(response.status, path))
+        return response.status, response_headers, body
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sync()
+                self.failures = 0
+                if not self.long_poll:
+                    self._stopped.wait(self.interval)
+            except SchemaError as schema_error:
+                # reachable, but what it sent doesn't fit here. it's asked
+                # for again (from the same version) until it does.
+                self._back_off('upstream config rejected by the schema: {}'.format(schema_error))
+            except (HTTPException, socket.error, IOError, ValueError, KeyError):
+                if self._stopped.is_set():
+                    return
+                self._back_off('upstream config unreachable')
+
+    def _back_off(self, reason):
+        self.failures += 1
+        backoff = min(self.max_backoff, self.interval * 2 ** min(self.failures - 1, 16))
+        self.logger and self.logger.warning('{} ({} in a row). next try in {:.1f}s',
+                                            reason, self.failures, backoff)
+        # jitter, so followers that failed together don't retry together
+        self._stopped.wait(backoff * random.uniform(0.5, 1.0))
+
+
+class ConnectionPool(object):
+    def __init__(self, scheme, netloc, size=2, timeout=60.0):
+        """
+        Keep-alive HTTP connections to one host, reused across requests.
+
+        :param scheme: 'http' or 'https'
+         :type scheme: str
+
+        :param netloc: host[:port]
+         :type netloc: str
+
+        :param size: (optional) idle connections to keep
+         :type size: int
+
+        :param timeout: (optional) socket timeout, in seconds
+         :type timeout: float
+        """
+        self.connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        self.netloc = netloc
+        self.size = size
+        self.timeout = timeout
+        self.created = 0  # connections opened, ever
+
+        self._idle = []
+        self._busy = set()
+        self._lock = Lock()
+        self._closed = False
+
+    def acquire(self):
+        with self._lock:
+            if self._closed:
+                raise UpstreamError('connection pool is closed')
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                connection = self.connection_class(self.netloc, timeout=self.timeout)
+                self.created += 1
+            self._busy.add(connection)
+            return connection
+
+    def release(self, connection):
+        with self._lock:
+            self._busy.discard(connection)
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def discard(self, connection):
+        with self._lock:
+            self._busy.discard(connection)
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            connections = self._idle + list(self._busy)
+            self._idle = []
+        for connection in connections:
+            if connection.sock is not None:
+                # shutdown() (not just close()) wakes up a thread reading from it
+                try:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+            connection.close()
@@ -0,0 +1,173 @@
+import errno
+import os
+import select
+import sys
+from threading import Event, Thread
+
+# from <sys/inotify.h>
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+
+
+class FileWatcher(object):
+    def __init__(self, path, on_change, interval=1.0, use_inotify=True, logger=None,
+                 signature=None):
+        """
+        Calls `on_change` (on a background thread) whenever the file at `path`
+        changes, as told by its mtime, size and inode.
+
+        that's one stat() every `interval` seconds while nothing happens. on
+        linux, inotify on the file's directory (or on `path`, if it's a
+        directory) wakes the watcher up as soon as something is written
+        there, instead of waiting out the interval.
+
+        :param path: the file (or directory) to watch
+         :type path: str
+
+        :param on_change: what to call when it changes
+         :type on_change: callable
+
+        :param interval: (optional) seconds between looks at the file
+         :type interval: float
+
+        :param use_inotify: (optional) use inotify where it's available
+         :type use_inotify: bool
+
+        :param logger: (optional) a logger to write errors to
+         :type logger: logging.Logger
+
+        :param signature: (optional) callable() => what tells a change,
+            None while there's nothing to load. default: file_signature
+            of `path`
+         :type signature: callable
+        """
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.interval = interval
+        self.logger = logger
+        self._signature = signature or (lambda: file_signature(self.path))
+
+        self.signature = self._signature()
+
+        self._inotify = None
+        if use_inotify:
+            self._inotify = _Inotify.open(
+                self.path if os.path.isdir(self.path) else os.path.dirname(self.path))
+
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name='configurable-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def mark_seen(self):
+        """
+            takes the file as it is now as already seen (say, we just wrote it).
+        """
+        self.signature = self._signature()
+
+    def check(self):
+        """
+            calls on_change if the file changed since we last saw it.
+
+        :returns bool
+            whether on_change was called (and didn't raise)
+        """
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return False
+
+        try:
+            self.on_change()
+        except Exception:
+            self.logger and self.logger.exception('failed to reload {}', self.path)
+            return False
+
+        # the signature from *before* on_change read the file: if it changed
+        # while being read, the next check picks that up.
+        self.signature = signature
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        if self._inotify:
+            self._inotify.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._inotify:
+                self._inotify.wait(self.interval)
+            else:
+                self._stopped.wait(self.interval)
+
+            if not self._stopped.is_set():
+                self.check()
+
+
+def file_signature(path):
+    """
+    :param path: path to a file
+     :type path: str
+
+    :returns tuple
+        (mtime, size, inode) of the file, or None if it isn't there
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size, stat.st_ino
+
+
+class _Inotify(object):
+    def __init__(self, fd):
+        self.fd = fd
+
+    @classmethod
+    def open(cls, directory):
+        """
+        :returns _Inotify
+            watching `directory` for files written, moved in, created or
+            removed. None if inotify isn't available.
+        """
+        if not sys.platform.startswith('linux'):
+            return None
+        # imported here: ctypes.util pulls in subprocess, which costs startup
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        if not isinstance(directory, bytes):
+            directory = directory.encode(sys.getfilesystemencoding())
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        if libc.inotify_add_watch(fd, directory, mask) < 0:
+            os.close(fd)
+            return None
+        return cls(fd)
+
+    def wait(self, timeout):
+        """
+            waits up to `timeout` seconds for something to happen, then
+            throws the events away: the caller stat()s the file either way.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        while readable:
+            try:
+                os.read(self.fd, 4096)
+            except OSError as os_error:
+                if os_error.errno == errno.EAGAIN:
+                    return
+                raise
+
+    def close(self):
+        os.close(self.fd)
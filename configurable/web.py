@@ -0,0 +1,422 @@
+import json
+
+from configurable.changes import STRING_TYPES, compose_patches, flatten_path
+from configurable.schema import SchemaError
+
+try:
+    from urlparse import parse_qs
+except ImportError:  # python 3
+    from urllib.parse import parse_qs
+
+# the longest a /config/watch request may wait, in seconds
+MAX_WATCH_TIMEOUT = 300
+
+
+class Request(object):
+    def __init__(self, method, path, query_string='', headers=None, body=b''):
+        """
+        What the /config/ routes need to know about a request, whatever
+        server (WSGI, ASGI) it came in through.
+
+        :param method: 'GET', 'PATCH', ...
+         :type method: str
+
+        :param path: the path, starting with the /config/ prefix
+         :type path: str
+
+        :param query_string: (optional) what came after the '?'
+         :type query_string: str
+
+        :param headers: (optional) dict[lowercase header name] => value
+         :type headers: dict
+
+        :param body: (optional) the request body
+         :type body: bytes
+        """
+        self.method = method.upper()
+        self.path = path
+        self.query_string = query_string
+        self.headers = headers or {}
+        self.body = body
+        self._args = None
+
+    @property
+    def args(self):
+        """
+            dict[query parameter] => its first value
+        """
+        if self._args is None:
+            self._args = dict((name, values[0]) for name, values
+                              in parse_qs(self.query_string).items())
+        return self._args
+
+    def header(self, name, default=''):
+        return self.headers.get(name.lower(), default)
+
+
+class Response(object):
+    REASONS = {
+        200: 'OK',
+        304: 'Not Modified',
+        400: 'Bad Request',
+        403: 'Forbidden',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+    }
+
+    def __init__(self, body=b'', status=200, content_type='application/json',
+                 headers=None):
+        """
+        :param body: the response body
+         :type body: bytes or str or iterable
+
+        :param status: (optional) the status code
+         :type status: int
+
+        :param content_type: (optional) None for no Content-Type (say, a 304)
+         :type content_type: str
+
+        :param headers: (optional) [(name, value), ...] to send along
+         :type headers: list
+        """
+        if isinstance(body, type(u'')):
+            body = body.encode('utf-8')
+        self.body = body  # or an iterable of bytes, to stream
+        self.status = status
+        self.headers = list(headers or [])
+        if content_type:
+            self.headers.append(('Content-Type', content_type))
+
+    @property
+    def status_line(self):
+        return '{} {}'.format(self.status, self.REASONS.get(self.status, 'Unknown'))
+
+
+class WSGIResponder(object):
+    def __init__(self, routes):
+        """
+        A bare WSGI application serving `routes`: no framework, no request
+        context, just the environ turned into a Request.
+
+        :param routes: the routes to serve
+         :type routes: ConfigRoutes
+        """
+        self.routes = routes
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        body = b''
+        if method not in ('GET', 'HEAD'):
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+            if length:
+                body = environ['wsgi.input'].read(length)
+
+        headers = {}
+        for name, value in environ.items():
+            if name.startswith('HTTP_'):
+                headers[name[5:].replace('_', '-').lower()] = value
+        if 'CONTENT_TYPE' in environ:
+            headers['content-type'] = environ['CONTENT_TYPE']
+
+        request = Request('GET' if method == 'HEAD' else method,
+                          _wsgi_path(environ.get('PATH_INFO', '')),
+                          query_string=environ.get('QUERY_STRING', ''),
+                          headers=headers, body=body)
+        response = self.routes.handle(request)
+
+        response_headers = list(response.headers)
+        if isinstance(response.body, bytes):
+            response_headers.append(('Content-Length', str(len(response.body))))
+        start_response(response.status_line, response_headers)
+        if method == 'HEAD':
+            return [b'']
+        if isinstance(response.body, bytes):
+            return [response.body]
+        return response.body
+
+
+def _wsgi_path(path):
+    # PEP 3333: on python 3 the path comes as latin-1, whatever it was
+    if not isinstance(path, bytes):
+        try:
+            return path.encode('latin-1').decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            return path
+    return path
+
+
+def etag_matches(if_none_match, etag):
+    """
+        whether an If-None-Match header value names `etag` (or is '*').
+        weak etags (W/"...") match too, as RFC 7232 says they should for
+        GET.
+
+    :param if_none_match: the header value, '' if there wasn't one
+     :type if_none_match: str
+
+    :param etag: an unquoted etag
+     :type etag: str
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class ConfigRoutes(object):
+    def __init__(self, conf_api, prefix='/config/'):
+        """
+        The routes a Configurable serves under /config/, written against
+        Request and Response only, so every way of serving them (the flask
+        app, the ASGI middleware) answers the same.
+
+        :param conf_api: the Configurable being served
+         :type conf_api: configurable.Configurable
+
+        :param prefix: (optional) where the routes are mounted
+         :type prefix: str
+        """
+        self.conf_api = conf_api
+        self.prefix = prefix
+        self.routes = {
+            '': {'GET': self.get_config, 'PATCH': self.patch_config,
+                 'POST': self.patch_config},
+            'metrics': {'GET': self.get_metrics},
+            'watch': {'GET': self.watch},
+            'hash': {'GET': self.get_hashes},
+        }
+
+    def handle(self, request):
+        """
+        :param request: a request whose path starts with the prefix
+         :type request: Request
+
+        :returns Response
+        """
+        route = request.path[len(self.prefix):]
+        methods = self.routes.get(route)
+        if methods is None:
+            # anything else is a path into the config
+            methods = {'GET': self.get_subtree}
+        handler = methods.get(request.method)
+        if handler is None:
+            return Response('method not allowed', status=405, content_type='text/plain',
+                            headers=[('Allow', ', '.join(sorted(methods)))])
+        return handler(request)
+
+    def get_config(self, request):
+        """
+            the whole config, or with ?since=<version> only what changed
+            after that version:
+
+                {"version": int, "changes": {path: value, ...}, "removed": [path, ...]}
+
+            or, when those changes are no longer known, everything:
+
+                {"version": int, "config": {...}}
+
+            the version of a whole config is in its X-Config-Version header.
+        """
+        conf_api = self.conf_api
+        started = conf_api.metrics and conf_api.metrics.clock()
+        since = request.args.get('since')
+        if since is not None:
+            response = self.get_changes(since)
+        else:
+            version, body, etag = conf_api._serialize()
+            headers = [('ETag', '"{}"'.format(etag)), ('X-Config-Version', str(version))]
+            if etag_matches(request.header('If-None-Match'), etag):
+                response = Response(status=304, content_type=None, headers=headers)
+            else:
+                response = Response(body, headers=headers)
+        conf_api.metrics and conf_api.metrics.observe('serve', started)
+        return response
+
+    def get_subtree(self, request):
+        """
+            GET /config/<path>: the json of just that part of the config,
+            with its own etag. a path is in '.'-notation (mysql.host), and
+            the routes above come first.
+        """
+        conf_api = self.conf_api
+        started = conf_api.metrics and conf_api.metrics.clock()
+        try:
+            body, etag = conf_api.serialized_subtree(request.path[len(self.prefix):])
+        except KeyError:
+            return Response('not found', status=404, content_type='text/plain')
+        headers = [('ETag', '"{}"'.format(etag))]
+        if etag_matches(request.header('If-None-Match'), etag):
+            response = Response(status=304, content_type=None, headers=headers)
+        else:
+            response = Response(body, headers=headers)
+        conf_api.metrics and conf_api.metrics.observe('serve', started)
+        return response
+
+    def get_changes(self, since):
+        try:
+            since = int(since)
+        except ValueError:
+            return Response('since must be a version', status=400, content_type='text/plain')
+
+        return Response(self.changes_body(since)[1])
+
+    def changes_body(self, since):
+        """
+        :returns tuple
+            (version, json of what changed since `since`, or of everything).
+            a path with a '.' in one of its keys also gets its keys listed,
+            under "keys", since splitting it wouldn't give them back.
+        """
+        delta = self.conf_api._changes_since(since)
+        if delta is None:
+            version, body, _ = self.conf_api._serialize()
+            return version, ('{{"version": {}, "config": '.format(version).encode('utf-8') +
+                             body + b'}')
+        version, changed, removed = delta
+        document = {'version': version,
+                    'changes': dict((flatten_path(path), value) for path, value in changed.items()),
+                    'removed': [flatten_path(path) for path in removed]}
+        dotted = [path for path in list(changed) + removed
+                  if any(isinstance(key, STRING_TYPES) and '.' in key for key in path)]
+        if dotted:
+            document['keys'] = dict((flatten_path(path), list(path)) for path in dotted)
+        body = json.dumps(document)
+        return version, body if isinstance(body, bytes) else body.encode('utf-8')
+
+    def patch_config(self, request):
+        """
+            merges a json document (nested, or with '.'-notation keys) into
+            the config, or a list of them: a whole batch is composed first
+            and merged as one write, so it takes the lock once, makes one
+            change set and one save (or journal append).
+
+            answers {"changes": {path: [new, old], ...}, "version": int}, or
+            a 400 with {"errors": {path: message, ...}} if it doesn't fit
+            the schema (and then none of it is merged)
+        """
+        conf_api = self.conf_api
+        if not conf_api.api_writes:
+            return Response('writes are off', status=403, content_type='text/plain')
+
+        try:
+            document = json.loads(request.body.decode('utf-8'))
+        except ValueError:
+            return Response('not json', status=400, content_type='text/plain')
+        patches = document if isinstance(document, list) else [document]
+        if not all(isinstance(patch, dict) for patch in patches):
+            return Response('expected an object or a list of objects', status=400,
+                            content_type='text/plain')
+
+        with conf_api.lock:
+            try:
+                changes = conf_api.merge_in_dict(compose_patches(patches))
+            except SchemaError as schema_error:
+                return Response(json.dumps({'errors': dict(schema_error.errors)}), status=400)
+            if changes and conf_api.local_file and conf_api._journal is None:
+                # merges only stay in memory: a batch over http is saved, once
+                conf_api._save_soon()
+            version = conf_api.version
+        return Response(json.dumps({'changes': changes, 'version': version}))
+
+    def watch(self, request):
+        """
+            waits for the config to change past ?since=<version> (default:
+            the current version), then answers like GET /config/?since=.
+            after ?timeout= seconds (default 30) it answers anyway, with no
+            changes.
+
+            with Accept: text/event-stream (or ?stream=sse) it's a
+            server-sent event stream instead: one `change` event per write,
+            data as above, and a comment every `timeout` seconds to keep
+            the connection alive. Last-Event-ID picks up where a dropped
+            stream left off.
+        """
+        try:
+            since, timeout, stream = self.watch_params(request)
+        except ValueError as value_error:
+            return Response(str(value_error), status=400, content_type='text/plain')
+
+        if stream:
+            return Response(self._events(since, timeout), content_type='text/event-stream',
+                            headers=[('Cache-Control', 'no-cache')])
+        self.conf_api.notifier.wait(since, timeout)
+        return Response(self.changes_body(since)[1])
+
+    def watch_params(self, request):
+        """
+        :returns tuple
+            (since, timeout, stream) of a /config/watch request
+
+        :raises ValueError
+            if they don't make sense
+        """
+        stream = (request.args.get('stream') == 'sse' or
+                  'text/event-stream' in request.header('Accept'))
+        since = request.args.get('since', request.header('Last-Event-ID', None) if stream else None)
+        try:
+            since = self.conf_api.version if since is None else int(since)
+            timeout = float(request.args.get('timeout', 30))
+        except ValueError:
+            raise ValueError('since must be a version and timeout seconds')
+        if not 0 < timeout <= MAX_WATCH_TIMEOUT:
+            raise ValueError('timeout must be up to {} seconds'.format(MAX_WATCH_TIMEOUT))
+        return since, timeout, stream
+
+    def event(self, since):
+        """
+        :returns tuple
+            (version, the server-sent event of what changed since `since`)
+        """
+        version, body = self.changes_body(since)
+        return version, (b'event: change\nid: ' + str(version).encode('ascii') +
+                         b'\ndata: ' + body + b'\n\n')
+
+    def _events(self, since, heartbeat):
+        notifier = self.conf_api.notifier
+        yield b': watching\n\n'
+        while True:
+            if notifier.wait(since, heartbeat) <= since:
+                yield b': still watching\n\n'
+                continue
+            since, event = self.event(since)
+            yield event
+
+    def get_hashes(self, request):
+        """
+            GET /config/hash?path=<path>&depth=<levels>: the content hashes
+            of the subtree at `path` (default: all of it) and of what's
+            under it, `depth` (default 1) levels down:
+
+                {"version": int, "hashes": {path: hash, ...}}
+        """
+        conf_api = self.conf_api
+        if conf_api._hashes is None:
+            return Response('hashes are off', status=404, content_type='text/plain')
+        try:
+            depth = int(request.args.get('depth', 1))
+        except ValueError:
+            return Response('depth must be a number', status=400, content_type='text/plain')
+
+        with conf_api.lock:
+            try:
+                hashes = conf_api.subtree_hashes(request.args.get('path', ''), depth=depth)
+            except KeyError:
+                return Response('not found', status=404, content_type='text/plain')
+            version = conf_api.version
+        return Response(json.dumps({'version': version, 'hashes': hashes}))
+
+    def get_metrics(self, request):
+        metrics = self.conf_api.metrics
+        if not metrics:
+            return Response('metrics are off', status=404, content_type='text/plain')
+        if (request.args.get('format') == 'prometheus' or
+                'text/plain' in request.header('Accept')):
+            return Response(metrics.prometheus(),
+                            content_type='text/plain; version=0.0.4')
+        return Response(json.dumps(metrics.snapshot()))
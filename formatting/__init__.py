@@ -1,24 +1,81 @@
-from formatting.formats import YAML, JSON
+import os
+from importlib import import_module
 
 
 class FormatFactory(object):
+    # format name => the Format, or 'module:attribute' to import it from
+    # the first time it's asked for
     FORMATS = {
-        "yml": YAML,
-        "yaml": YAML,
-        "json": JSON,
+        "yml": "formatting.yaml_formats:YAML",
+        "yaml": "formatting.yaml_formats:YAML",
+        "json": "formatting.formats:JSON",
+        "pickle": "formatting.formats:Pickle",
     }
 
+    # file extension => format name
+    EXTENSIONS = {
+        ".yml": "yml",
+        ".yaml": "yaml",
+        ".json": "json",
+        ".pickle": "pickle",
+        ".pkl": "pickle",
+    }
+
+    @staticmethod
+    def register(format_name, with_format, extensions=()):
+        """
+            adds a format (or replaces one) for get_formatter and for_path.
+
+            >>> FormatFactory.register('toml', 'mypackage.formats:TOML', ['.toml'])
+
+        :param format_name: the name to get it by
+         :type format_name: str
+
+        :param with_format: the Format, or 'module:attribute' where it is,
+            to import it only once it's used
+         :type with_format: ~formatting.Format or str
+
+        :param extensions: (optional) file extensions (with the dot) of
+            files in this format
+         :type extensions: list of str
+        """
+        FormatFactory.FORMATS[format_name] = with_format
+        for extension in extensions:
+            FormatFactory.EXTENSIONS[extension.lower()] = format_name
+
     @staticmethod
     def get_formatter(format_name='yml'):
         """
         :param format_name: the format you'd like to use default: yaml
-            also accepts: yml | yaml -> yaml, json -> json
+            also accepts: yml | yaml -> yaml, json -> json, pickle -> pickle,
+            and whatever else was register()ed
          :type format_name: str
         """
         if (not format_name) or (format_name not in FormatFactory.FORMATS):
             format_name = 'yml'
 
-        return Formatter(format_name, FormatFactory.FORMATS[format_name])
+        with_format = FormatFactory.FORMATS[format_name]
+        if isinstance(with_format, str):
+            module_name, _, attribute = with_format.partition(':')
+            with_format = getattr(import_module(module_name), attribute)
+            FormatFactory.FORMATS[format_name] = with_format
+
+        return Formatter(format_name, with_format)
+
+    @staticmethod
+    def for_path(file_path, default='yml'):
+        """
+        :param file_path: a file
+         :type file_path: str
+
+        :param default: (optional) the format for extensions nobody registered
+         :type default: str
+
+        :returns Formatter
+            for the format that file's extension says it's in
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        return FormatFactory.get_formatter(FormatFactory.EXTENSIONS.get(extension, default))
 
 
 class Formatter(object):
@@ -43,6 +100,14 @@ class Formatter(object):
     def get_fmt(self):
         return self.format_name
 
+    def get_backend(self):
+        """
+        :returns str
+            what's doing the work for the format, e.g. 'libyaml' or 'python'
+            for YAML. None if the format doesn't say.
+        """
+        return getattr(self.format, 'backend', None)
+
     def load(self, fp):
         return self.format.load(fp)
 
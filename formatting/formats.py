@@ -1,37 +1,62 @@
+"""
+    the formats that need nothing beyond the standard library. YAML is in
+    formatting.yaml_formats, so that PyYAML is only imported when it's used.
+"""
 import json
-from StringIO import StringIO
 
-import yaml
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
-# In the case of JSON, the module already provides
-# all the functions we expect of a Format.
-JSON = json
 
-
-class YAML(object):
+class JSON(object):
+    """
+        the json module already provides all the functions we expect of a
+        Format, except that on python 3 it dumps str, and config files are
+        opened in binary mode. so: bytes out, utf-8.
     """
-        a simple wrapper of the yaml module to satisfy what a "Format" is:
+    @staticmethod
+    def load(fp):
+        return json.loads(fp.read().decode('utf-8'))
 
-            def load(fp):
-            def loads(string):
-            def dump(fp):
-            def dumps(obj):
+    @staticmethod
+    def loads(string):
+        if isinstance(string, bytes):
+            string = string.decode('utf-8')
+        return json.loads(string)
+
+    @staticmethod
+    def dump(obj, fp):
+        fp.write(JSON.dumps(obj))
+
+    @staticmethod
+    def dumps(obj):
+        string = json.dumps(obj)
+        if not isinstance(string, bytes):
+            string = string.encode('utf-8')
+        return string
+
+
+class Pickle(object):
+    """
+        python's own binary format: fast to load and dump, but only for
+        python to read, and only from files you trust as much as your code.
     """
+    backend = 'pickle'
 
     @staticmethod
     def load(fp):
-        return yaml.load(fp)
+        return pickle.load(fp)
 
     @staticmethod
     def loads(string):
-        return yaml.load(StringIO(string))
+        return pickle.loads(string)
 
     @staticmethod
     def dump(obj, fp):
-        return yaml.dump(obj, stream=fp)
+        return pickle.dump(obj, fp, pickle.HIGHEST_PROTOCOL)
 
     @staticmethod
     def dumps(obj):
-        temp_string = StringIO()
-        yaml.dump(obj, stream=temp_string)
-        return temp_string.getvalue()
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,49 @@
+import yaml
+
+
+class YAML(object):
+    """
+        a simple wrapper of the yaml module to satisfy what a "Format" is:
+
+            def load(fp):
+            def loads(string):
+            def dump(fp):
+            def dumps(obj):
+
+        when PyYAML was built with libyaml, its C loader and dumper are
+        used, which is many times faster on big files. `backend` says which.
+    """
+    if getattr(yaml, '__with_libyaml__', False):
+        Loader = yaml.CSafeLoader
+        Dumper = yaml.CSafeDumper
+        backend = 'libyaml'
+    else:
+        Loader = yaml.SafeLoader
+        Dumper = yaml.SafeDumper
+        backend = 'python'
+
+    @classmethod
+    def load(cls, fp):
+        return yaml.load(fp, Loader=cls.Loader)
+
+    @classmethod
+    def loads(cls, string):
+        return yaml.load(string, Loader=cls.Loader)
+
+    @classmethod
+    def dump(cls, obj, fp):
+        return yaml.dump(obj, fp, Dumper=cls.Dumper, encoding='utf-8')
+
+    @classmethod
+    def dumps(cls, obj):
+        # bytes, as dump writes and JSON.dumps returns
+        return yaml.dump(obj, Dumper=cls.Dumper, encoding='utf-8')
+
+
+class PythonYAML(YAML):
+    """
+        YAML, but always the pure python loader and dumper.
+    """
+    Loader = yaml.SafeLoader
+    Dumper = yaml.SafeDumper
+    backend = 'python'
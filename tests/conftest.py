@@ -0,0 +1,5 @@
+import sys
+
+# asyncio (and the syntax that goes with it) is python 3.5+. everything else
+# runs on both 2.7 and 3, so a python 3 run covers the whole suite.
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 5) else []
@@ -1,6 +1,9 @@
 import unittest
 
-from formatting import FormatFactory
+import yaml
+
+from formatting import FormatFactory, Formatter
+from formatting.yaml_formats import PythonYAML
 
 
 class FormatsTest(unittest.TestCase):
@@ -39,18 +42,59 @@ class FormatsTest(unittest.TestCase):
         self.assertEquals("yml", formatter.get_fmt())
 
         serialized = formatter.dumps(self.test_dict)
-        self.assertTrue(isinstance(serialized, str))
+        self.assertTrue(isinstance(serialized, bytes))
 
         deserialized = formatter.loads(serialized)
 
         self.assertEquals(self.test_dict, deserialized)
 
+    def test_yaml_backends(self):
+        formatter = FormatFactory.get_formatter()
+        if yaml.__with_libyaml__:
+            self.assertEquals('libyaml', formatter.get_backend())
+        else:
+            self.assertEquals('python', formatter.get_backend())
+
+        # whichever backend wrote it, either can read it
+        python_formatter = Formatter('yml', PythonYAML)
+        self.assertEquals('python', python_formatter.get_backend())
+        self.assertEquals(self.test_dict,
+                          python_formatter.loads(formatter.dumps(self.test_dict)))
+        self.assertEquals(self.test_dict,
+                          formatter.loads(python_formatter.dumps(self.test_dict)))
+
     def test_json_formatter(self):
         formatter = FormatFactory.get_formatter(format_name="json")
 
         serialized = formatter.dumps(self.test_dict)
-        self.assertTrue(isinstance(serialized, str))
+        self.assertTrue(isinstance(serialized, bytes))
 
         deserialized = formatter.loads(serialized)
 
         self.assertEquals(self.test_dict, deserialized)
+
+    def test_pickle_formatter(self):
+        formatter = FormatFactory.get_formatter(format_name="pickle")
+
+        serialized = formatter.dumps(self.test_dict)
+        self.assertTrue(isinstance(serialized, bytes))
+
+        deserialized = formatter.loads(serialized)
+
+        self.assertEquals(self.test_dict, deserialized)
+
+    def test_registry(self):
+        self.assertEquals('json', FormatFactory.for_path('/etc/app/config.json').get_fmt())
+        self.assertEquals('yaml', FormatFactory.for_path('config.YAML').get_fmt())
+        self.assertEquals('yml', FormatFactory.for_path('config.conf').get_fmt())
+
+        # registered by where it is: nothing's imported until it's used
+        FormatFactory.register('test_json', 'formatting.formats:JSON', ['.test-json'])
+        try:
+            self.assertEquals('formatting.formats:JSON', FormatFactory.FORMATS['test_json'])
+            formatter = FormatFactory.for_path('config.test-json')
+            self.assertEquals('test_json', formatter.get_fmt())
+            self.assertEquals(self.test_dict, formatter.loads(formatter.dumps(self.test_dict)))
+        finally:
+            del FormatFactory.FORMATS['test_json']
+            del FormatFactory.EXTENSIONS['.test-json']
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from configurable.aio import AsyncConfigurable
+from formatting import FormatFactory
+
+
+class AsyncConfigurableTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.formatter = FormatFactory.get_formatter()
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.yml')
+        self.formatter.dump({'a': 1, 'b': {'c': 2}}, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+
+    def tearDown(self):
+        self.loop.close()
+        os.unlink(self.file_name)
+
+    def run_async(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as infile:
+            return self.formatter.load(infile)
+
+    def test_writes(self):
+        conf_api = AsyncConfigurable(local_file=self.file_name)
+        self.assertEqual(2, conf_api['b.c'])
+
+        changes = self.run_async(conf_api.merge_in_dict_async({'b': {'c': 3}}))
+        self.assertEqual({'b.c': (3, 2)}, changes)
+        # a merge only changes memory
+        self.assertEqual({'a': 1, 'b': {'c': 2}}, self.read_file())
+        self.run_async(conf_api.save_async())
+        self.assertEqual({'a': 1, 'b': {'c': 3}}, self.read_file())
+
+        with open(self.file_name, 'wb') as outfile:
+            self.formatter.dump({'a': 2, 'b': {'c': 3}}, outfile)
+        changes = self.run_async(conf_api.load_async())
+        self.assertEqual({'a': (2, 1)}, changes)
+        self.assertEqual(2, conf_api['a'])
+
+    def test_asgi_middleware(self):
+        conf_api = AsyncConfigurable(defaults={'a': 1})
+
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'hello'})
+
+        middleware = conf_api.asgi_middleware(application)
+
+        status, headers, body = self.run_async(call_asgi(middleware, '/hello'))
+        self.assertEqual((200, b'hello'), (status, body))
+
+        status, headers, body = self.run_async(call_asgi(middleware, '/config/'))
+        self.assertEqual(200, status)
+        self.assertEqual({'a': 1}, json.loads(body.decode('utf-8')))
+
+        etag = headers[b'etag']
+        status, _, body = self.run_async(call_asgi(middleware, '/config/',
+                                                   [(b'if-none-match', etag)]))
+        self.assertEqual((304, b''), (status, body))
+
+        # HEAD is GET without the body, as under WSGI
+        status, headers, body = self.run_async(call_asgi(middleware, '/config/', method='HEAD'))
+        self.assertEqual((200, etag, b''), (status, headers[b'etag'], body))
+
+        status, _, _ = self.run_async(call_asgi(middleware, '/config/metrics'))
+        self.assertEqual(404, status)
+
+    def test_asgi_off_the_loop(self):
+        # only a plain GET of the cached config is answered on the loop: the
+        # rest can wait on the lock, and has to do it on the executor
+        conf_api = AsyncConfigurable(defaults={'a': 1})
+        middleware = conf_api.asgi_middleware(None)
+        conf_api.serialized_config()
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with conf_api.lock:
+                locked.set()
+                release.wait(5)
+
+        async def ask():
+            asking = asyncio.ensure_future(call_asgi(middleware, '/config/',
+                                                     query_string=b'since=0'))
+            await asyncio.sleep(0.05)
+            # the loop got here while the request waits
+            self.assertFalse(asking.done())
+            release.set()
+            return await asking
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait(5)
+        status, _, _ = self.run_async(ask())
+        holder.join()
+        self.assertEqual(200, status)
+
+    def test_asgi_watch(self):
+        conf_api = AsyncConfigurable(defaults={'a': 1})
+        middleware = conf_api.asgi_middleware(None)
+        version = conf_api.version
+
+        async def write_later():
+            await asyncio.sleep(0.05)
+            await conf_api.merge_in_dict_async({'a': 2})
+
+        async def long_poll():
+            writer = asyncio.ensure_future(write_later())
+            answer = await call_asgi(middleware, '/config/watch', query_string=b'timeout=5')
+            await writer
+            return answer
+
+        status, _, body = self.run_async(long_poll())
+        self.assertEqual(200, status)
+        self.assertEqual({'version': version + 1, 'changes': {'a': 2}, 'removed': []},
+                         json.loads(body.decode('utf-8')))
+
+        async def stream():
+            disconnect = asyncio.Event()
+            watching = asyncio.ensure_future(call_asgi(
+                middleware, '/config/watch', query_string=b'stream=sse&timeout=5',
+                disconnect=disconnect))
+            await asyncio.sleep(0.05)
+            conf_api['b'] = 3
+            await asyncio.sleep(0.05)
+            disconnect.set()
+            return await watching
+
+        status, headers, body = self.run_async(stream())
+        self.assertEqual(b'text/event-stream', headers[b'content-type'])
+        events = body.decode('utf-8').split('\n\n')
+        self.assertEqual(': watching', events[0])
+        lines = events[1].split('\n')
+        self.assertEqual(['event: change', 'id: {}'.format(version + 2)], lines[:2])
+        self.assertEqual({'version': version + 2, 'changes': {'b': 3}, 'removed': []},
+                         json.loads(lines[2][len('data: '):]))
+
+
+async def call_asgi(application, path, headers=(), query_string=b'', disconnect=None,
+                    method='GET'):
+    """
+    :returns tuple
+        (status, dict[header] => value, body)
+    """
+    sent = []
+
+    received = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': query_string, 'headers': list(headers)}
+    await application(scope, receive, send)
+    return (sent[0]['status'], dict(sent[0]['headers']),
+            b''.join(message.get('body', b'') for message in sent[1:]))
@@ -1,8 +1,13 @@
 import json
+import os
+import tempfile
+import threading
 import unittest
 
 from flask import Flask
 from flask import current_app
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
 
 from configurable import Configurable
 
@@ -38,7 +43,7 @@ class APITest(unittest.TestCase):
         # 1. can we still get what the API delivers ?
         client = self.test_app.test_client()
         response = client.get('/hello')
-        self.assertEquals("hello", response.data)
+        self.assertEquals(b"hello", response.data)
 
         # 2. can we access the /config/ route ?
         response = client.get('/config/')
@@ -49,3 +54,186 @@ class APITest(unittest.TestCase):
         response = client.get('/test_config')
         response_json = json.loads(response.data)
         self.assertEquals(response_json, test_config)
+
+    def test_config_etag(self):
+        conf_api = Configurable(flask_app=self.test_app, defaults={'a': 1})
+        client = self.test_app.test_client()
+
+        # 1. a plain GET hands out the etag of the body
+        response = client.get('/config/')
+        self.assertEquals(200, response.status_code)
+        etag = response.headers['ETag']
+        self.assertTrue(etag)
+
+        # 2. nothing changed: 304 with no body
+        response = client.get('/config/', headers={'If-None-Match': etag})
+        self.assertEquals(304, response.status_code)
+        self.assertEquals(b'', response.data)
+
+        # 3. a write changes the version and so the etag
+        version = conf_api.version
+        conf_api.merge_in_dict({'b': 2})
+        self.assertEquals(version + 1, conf_api.version)
+
+        response = client.get('/config/', headers={'If-None-Match': etag})
+        self.assertEquals(200, response.status_code)
+        self.assertNotEquals(etag, response.headers['ETag'])
+        self.assertEquals({'a': 1, 'b': 2}, json.loads(response.data))
+
+    def test_config_patch(self):
+        conf_api = Configurable(flask_app=self.test_app, defaults={'a': 1, 'b': {'c': 2}})
+        client = self.test_app.test_client()
+
+        # 1. writes are off unless asked for
+        response = client.patch('/config/', data=json.dumps({'a': 2}))
+        self.assertEquals(403, response.status_code)
+        self.assertEquals(1, conf_api['a'])
+
+        # 2. a batch is one write, and dotted paths reach into sections
+        conf_api.api_writes = True
+        version = conf_api.version
+        response = client.patch('/config/', data=json.dumps([
+            {'a': 2, 'b': {'c': 3}},
+            {'b.c': 4, 'b.d': 5},
+        ]))
+        self.assertEquals(200, response.status_code)
+        self.assertEquals({'changes': {'a': [2, 1], 'b.c': [4, 2], 'b.d': [5, None]},
+                           'version': version + 1},
+                          json.loads(response.data))
+        self.assertEquals({'a': 2, 'b': {'c': 4, 'd': 5}}, conf_api.config)
+
+        # 3. nonsense changes nothing
+        response = client.patch('/config/', data='[1, 2]')
+        self.assertEquals(400, response.status_code)
+        self.assertEquals(version + 1, conf_api.version)
+
+    def test_config_patch_saves(self):
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+        temp_file.write(b'{"a": 1}')
+        temp_file.close()
+        try:
+            Configurable(flask_app=self.test_app, local_file=temp_file.name, api_writes=True)
+            response = self.test_app.test_client().patch('/config/', data=json.dumps({'a': 2}))
+            self.assertEquals(200, response.status_code)
+            self.assertEquals({'a': 2}, Configurable(local_file=temp_file.name).config)
+        finally:
+            os.unlink(temp_file.name)
+
+    def test_config_since(self):
+        conf_api = Configurable(flask_app=self.test_app, changes_kept=3,
+                                defaults={'a': 1, 'b': {'c': 2, 'd': 3}})
+        client = self.test_app.test_client()
+
+        response = client.get('/config/')
+        version = int(response.headers['X-Config-Version'])
+
+        # 1. nothing since: nothing to send
+        response = client.get('/config/?since={}'.format(version))
+        self.assertEquals({'version': version, 'changes': {}, 'removed': []},
+                          json.loads(response.data))
+
+        # 2. only the paths written since, as they are now
+        conf_api.merge_in_dict({'b': {'c': 4}})
+        conf_api['a'] = 5
+        conf_api.merge_in_dict({'b': {'c': 6}})
+        response = client.get('/config/?since={}'.format(version))
+        self.assertEquals({'version': version + 3, 'changes': {'a': 5, 'b.c': 6}, 'removed': []},
+                          json.loads(response.data))
+
+        # 3. a section replaced covers what changed under it
+        conf_api['b'] = {'e': 7}
+        response = client.get('/config/?since={}'.format(version + 1))
+        self.assertEquals({'version': version + 4, 'changes': {'a': 5, 'b': {'e': 7}},
+                           'removed': []},
+                          json.loads(response.data))
+
+        # 4. forgotten: everything, as a snapshot
+        response = client.get('/config/?since={}'.format(version))
+        self.assertEquals({'version': version + 4, 'config': {'a': 5, 'b': {'e': 7}}},
+                          json.loads(response.data))
+
+        response = client.get('/config/?since=now')
+        self.assertEquals(400, response.status_code)
+
+    def test_config_watch(self):
+        conf_api = Configurable(flask_app=self.test_app, defaults={'a': 1})
+        client = self.test_app.test_client()
+        version = conf_api.version
+
+        # 1. nothing happens: an empty answer once the timeout is up
+        response = client.get('/config/watch?timeout=0.05')
+        self.assertEquals({'version': version, 'changes': {}, 'removed': []},
+                          json.loads(response.data))
+
+        # 2. the answer comes as soon as something's written
+        writer = threading.Timer(0.05, conf_api.merge_in_dict, [{'a': 2}])
+        writer.start()
+        response = client.get('/config/watch?timeout=5&since={}'.format(version))
+        writer.join()
+        self.assertEquals({'version': version + 1, 'changes': {'a': 2}, 'removed': []},
+                          json.loads(response.data))
+
+        # 3. a stream of events, one per write
+        response = client.get('/config/watch?timeout=5', headers={'Accept': 'text/event-stream'},
+                              buffered=False)
+        self.assertTrue(response.content_type.startswith('text/event-stream'))
+        events = iter(response.response)
+        self.assertEquals(b': watching\n\n', next(events))
+        conf_api['b'] = 3
+        event = next(events).decode('utf-8').split('\n')
+        self.assertEquals(['event: change', 'id: {}'.format(version + 2)], event[:2])
+        self.assertEquals({'version': version + 2, 'changes': {'b': 3}, 'removed': []},
+                          json.loads(event[2][len('data: '):]))
+        response.close()
+
+    def test_config_subtree(self):
+        conf_api = Configurable(flask_app=self.test_app,
+                                defaults={'mysql': {'host': 'db', 'port': 3306},
+                                          'application': {'debug': False}})
+        client = self.test_app.test_client()
+
+        # 1. a section, and a value in it
+        response = client.get('/config/mysql')
+        self.assertEquals({'host': 'db', 'port': 3306}, json.loads(response.data))
+        etag = response.headers['ETag']
+        response = client.get('/config/mysql.port')
+        self.assertEquals(3306, json.loads(response.data))
+        self.assertEquals(404, client.get('/config/mysql.user').status_code)
+
+        # 2. a write somewhere else doesn't touch it
+        conf_api.merge_in_dict({'application': {'debug': True}})
+        response = client.get('/config/mysql', headers={'If-None-Match': etag})
+        self.assertEquals(304, response.status_code)
+
+        # 3. a write under it, or over it, does
+        conf_api.merge_in_dict({'mysql': {'port': 3307}})
+        response = client.get('/config/mysql', headers={'If-None-Match': etag})
+        self.assertEquals(200, response.status_code)
+        self.assertEquals({'host': 'db', 'port': 3307}, json.loads(response.data))
+
+        conf_api['mysql'] = {'host': 'other'}
+        response = client.get('/config/mysql.host')
+        self.assertEquals('other', json.loads(response.data))
+
+    def test_config_prefix(self):
+        Configurable(flask_app=self.test_app, defaults={'a': 1}, prefix='/_config')
+        client = self.test_app.test_client()
+
+        # the app's own /config/ is its own again
+        self.assertEquals(404, client.get('/config/').status_code)
+        self.assertEquals({'a': 1}, json.loads(client.get('/_config/').data))
+        self.assertEquals(1, json.loads(client.get('/_config/a').data))
+
+        # the root would take every request from the app
+        self.assertRaises(ValueError, Configurable, prefix='/')
+
+        # any WSGI app can be wrapped, too
+        def hello(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'hello']
+
+        wrapped = Configurable(defaults={'a': 2}).wsgi_middleware(hello)
+        client = Client(wrapped, Response)
+        self.assertEquals(b'hello', client.get('/hello').data)
+        self.assertEquals({'a': 2}, json.loads(client.get('/config/').data))
+        self.assertEquals(b'', client.head('/config/').data)
@@ -0,0 +1,62 @@
+import threading
+import unittest
+
+from configurable import Configurable
+
+
+class CopyOnWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.test_config = {
+            'application': {'debug': False},
+            'mysql': {'host': 'localhost', 'words': ['a', 'b']}
+        }
+
+    def test_merge_leaves_snapshot_alone(self):
+        conf_api = Configurable(defaults=self.test_config, copy_on_write=True)
+        before = conf_api.config
+
+        changes = conf_api.merge_in_dict({'application': {'debug': True}})
+        self.assertEquals({'application.debug': (True, False)}, changes)
+
+        # the old snapshot is untouched, the new one has the change
+        self.assertEquals(False, before['application']['debug'])
+        self.assertEquals(True, conf_api['application']['debug'])
+
+        # untouched subtrees are shared between the two
+        self.assertTrue(before['mysql'] is conf_api['mysql'])
+        self.assertFalse(before['application'] is conf_api['application'])
+
+    def test_set_leaves_snapshot_alone(self):
+        conf_api = Configurable(defaults=self.test_config, copy_on_write=True)
+        before = conf_api.config
+
+        new_value = {'r': [True]}
+        conf_api['d'] = new_value
+        new_value['r'].append(False)
+
+        self.assertFalse('d' in before)
+        self.assertEquals({'r': [True]}, conf_api['d'])
+
+    def test_readers_see_whole_writes(self):
+        conf_api = Configurable(defaults={'a': {'x': 0, 'y': 0}}, copy_on_write=True)
+        torn_reads = []
+
+        def write():
+            for i in range(1, 2000):
+                conf_api.merge_in_dict({'a': {'x': i, 'y': i}})
+
+        def read():
+            for _ in range(2000):
+                a = conf_api['a']
+                if a['x'] != a['y']:
+                    torn_reads.append(a)
+
+        threads = [threading.Thread(target=write)] + \
+                  [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals([], torn_reads)
+        self.assertEquals({'x': 1999, 'y': 1999}, conf_api['a'])
@@ -86,3 +86,36 @@ class DictnessTest(unittest.TestCase):
             'd': {'r': {'a': [True]}}
         }
         self.assertEquals(expected_conf, conf_api.config)
+
+    def test_get_path(self):
+        test_config = {
+            'a': 1,
+            'b': {
+                'c': {'d': [True]},
+            },
+            'e.f': 'literal'
+        }
+
+        conf_api = Configurable(defaults=test_config)
+        conf_api._config = {'DEBUG': True}
+
+        # '.'-notation paths reach into nested dicts
+        self.assertEquals([True], conf_api['b.c.d'])
+        self.assertEquals({'d': [True]}, conf_api.get('b.c'))
+
+        # a key with a '.' in it wins over the path
+        self.assertEquals('literal', conf_api['e.f'])
+
+        # missing paths
+        with self.assertRaises(KeyError):
+            conf_api['b.c.x']
+        with self.assertRaises(KeyError):
+            conf_api['a.b']
+        self.assertEquals(10, conf_api.get('b.x.y', 10))
+
+        # the flask config is still there as a fallback
+        self.assertTrue(conf_api['DEBUG'])
+
+        # writes are seen straight away
+        conf_api.merge_in_dict({'b': {'c': {'d': [False]}}})
+        self.assertEquals([False], conf_api['b.c.d'])
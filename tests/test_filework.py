@@ -66,3 +66,35 @@ class FileworkTest(unittest.TestCase):
         self.assertEquals(self.test_config, conf_from_file)
         os.unlink(temp_file.name)
 
+
+    def test_reload_int_keys(self):
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.yml')
+        temp_file.write(b'ports: {80: http}\n')
+        temp_file.close()
+
+        conf_api = Configurable(local_file=temp_file.name)
+        with open(temp_file.name, 'wb') as outfile:
+            outfile.write(b'ports: {80: web}\n')
+        changes = conf_api.load()
+        os.unlink(temp_file.name)
+
+        self.assertEquals({'ports.80': ('web', 'http')}, changes)
+        self.assertEquals({80: 'web'}, conf_api['ports'])
+
+    def test_load_empty_file(self):
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.yml')
+        temp_file.close()
+
+        conf_api = Configurable(local_file=temp_file.name)
+        self.assertEquals({}, conf_api.config)
+
+        # truncated after a load: everything goes
+        with open(temp_file.name, 'wb') as outfile:
+            outfile.write(b'a: 1\n')
+        conf_api.load()
+        open(temp_file.name, 'wb').close()
+        changes = conf_api.load()
+        os.unlink(temp_file.name)
+
+        self.assertEquals({'a': (None, 1)}, changes)
+        self.assertEquals({}, conf_api.config)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from configurable import Configurable
+from configurable.fragments import Fragments
+from formatting import FormatFactory
+
+
+class FragmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.includes = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.includes)
+
+    def write(self, path, config):
+        with open(path, 'wb') as outfile:
+            FormatFactory.for_path(path).dump(config, outfile)
+        # a new mtime each time, however coarse the filesystem's
+        os.utime(path, (0, os.stat(path).st_mtime + 1))
+
+    def test_load(self):
+        for index in range(20):
+            self.write(os.path.join(self.directory, '{:02}-part.yml'.format(index)),
+                       {'parts': {str(index): index}, 'last': index})
+        self.write(os.path.join(self.directory, '50-db.json'),
+                   {'!include': os.path.join(self.includes, 'db-*.yml'), 'mysql': {'port': 3307}})
+        self.write(os.path.join(self.includes, 'db-1.yml'), {'mysql': {'host': 'db', 'port': 1}})
+        self.write(os.path.join(self.includes, 'db-2.yml'), {'mysql': {'user': 'me'}})
+        with open(os.path.join(self.directory, 'README'), 'w') as readme:
+            readme.write('not a fragment')
+
+        fragments = Fragments(self.directory)
+        config = fragments.load()
+        self.assertEquals(dict((str(index), index) for index in range(20)), config['parts'])
+        self.assertEquals(19, config['last'])
+        self.assertEquals({'host': 'db', 'port': 3307, 'user': 'me'}, config['mysql'])
+        self.assertEquals(23, fragments.parses)
+
+        # only what changed is parsed again, and what comes back is a copy
+        config['mysql']['host'] = 'changed'
+        self.write(os.path.join(self.includes, 'db-2.yml'), {'mysql': {'user': 'you'}})
+        os.remove(os.path.join(self.directory, '19-part.yml'))
+        config = fragments.load()
+        self.assertEquals({'host': 'db', 'port': 3307, 'user': 'you'}, config['mysql'])
+        self.assertEquals(18, config['last'])
+        self.assertEquals(24, fragments.parses)
+
+        self.write(os.path.join(self.includes, 'db-1.yml'),
+                   {'!include': os.path.join(self.directory, '50-db.json')})
+        self.assertRaises(ValueError, fragments.load)
+
+    def test_configurable(self):
+        self.write(os.path.join(self.directory, '10-base.yml'), {'a': 1, 'b': {'c': 2}})
+        self.write(os.path.join(self.directory, '20-site.yml'), {'b': {'d': 3}})
+        local_file = os.path.join(self.includes, 'local.yml')
+        self.write(local_file, {'a': 4})
+
+        conf_api = Configurable(local_file=local_file, config_dir=self.directory)
+        self.assertEquals({'a': 4, 'b': {'c': 2, 'd': 3}}, conf_api.config)
+
+        self.write(os.path.join(self.directory, '20-site.yml'), {'b': {'e': 5}})
+        self.assertEquals({'b.d': (None, 3), 'b.e': (5, None)}, conf_api.load())
+
+    def test_save_keeps_fragments(self):
+        self.write(os.path.join(self.directory, '10-base.yml'), {'mysql': {'host': 'db1', 'port': 1}})
+        local_file = os.path.join(self.includes, 'local.yml')
+        self.write(local_file, {'mysql': {'port': 2}})
+
+        conf_api = Configurable(local_file=local_file, config_dir=self.directory)
+        conf_api['x'] = 1
+        with open(local_file, 'rb') as infile:
+            self.assertEquals({'mysql': {'port': 2}, 'x': 1}, FormatFactory.for_path(local_file).load(infile))
+
+        # an edit to a fragment after a save still shows
+        self.write(os.path.join(self.directory, '10-base.yml'), {'mysql': {'host': 'db2', 'port': 1}})
+        conf_api.load()
+        self.assertEquals({'mysql': {'host': 'db2', 'port': 2}, 'x': 1}, conf_api.config)
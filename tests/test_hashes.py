@@ -0,0 +1,67 @@
+import json
+import random
+import unittest
+
+from flask import Flask
+
+from configurable import Configurable
+from configurable.merkle import MerkleHashes
+
+
+class HashesTest(unittest.TestCase):
+    def setUp(self):
+        self.test_config = {'a': 1, 'b': {'c': [2, 3], 'd': {'e': 'f'}}, 'g': {'h': 4}}
+
+    def test_incremental(self):
+        conf_api = Configurable(defaults=self.test_config, hashes=True)
+        other = Configurable(defaults={'g': {'h': 4}, 'b': {'d': {'e': 'f'}, 'c': [2, 3]}, 'a': 1},
+                             hashes=True)
+        # the same content hashes the same, however it was put together
+        self.assertEquals(conf_api.config_hash(), other.config_hash())
+        self.assertTrue(conf_api == other)
+
+        before = conf_api.subtree_hashes(depth=2)
+        conf_api.merge_in_dict({'b': {'d': {'e': 'x'}}})
+        after = conf_api.subtree_hashes(depth=2)
+
+        # only the path that changed has new hashes
+        self.assertEquals(set(['', 'b', 'b.d']),
+                          set(path for path in after if after[path] != before[path]))
+        self.assertFalse(conf_api == other)
+
+        # and they're what hashing from scratch would give
+        conf_api['g'] = {'h': 5, 'i': {'j': 6}}
+        conf_api.merge_in_dict({'a': {'k': 7}})
+        self.assertEquals(MerkleHashes(conf_api.config).root(), conf_api.config_hash())
+
+        # putting it back puts the hashes back
+        conf_api['a'] = 1
+        conf_api['g'] = {'h': 4}
+        conf_api.merge_in_dict({'b': {'d': {'e': 'f'}}})
+        self.assertEquals(other.config_hash(), conf_api.config_hash())
+
+    def test_random_writes(self):
+        conf_api = Configurable(defaults=self.test_config, hashes=True)
+        generator = random.Random(21)
+        for _ in range(200):
+            section = generator.choice(['a', 'b', 'g', 'x'])
+            key = generator.choice(['c', 'd', 'y'])
+            value = generator.choice([1, 2, {'z': 3}, [4]])
+            conf_api.merge_in_dict({section: {key: value}})
+            if generator.random() < 0.1:
+                conf_api[section] = value
+        self.assertEquals(MerkleHashes(conf_api.config).root(), conf_api.config_hash())
+
+    def test_hash_route(self):
+        application = Flask('test_api')
+        conf_api = Configurable(flask_app=application, defaults=self.test_config)
+        client = application.test_client()
+        self.assertEquals(404, client.get('/config/hash').status_code)
+
+        conf_api = Configurable(flask_app=application, defaults=self.test_config, hashes=True)
+        response = json.loads(client.get('/config/hash').data)
+        self.assertEquals(set(['', 'a', 'b', 'g']), set(response['hashes']))
+        self.assertEquals(conf_api.config_hash('b'), response['hashes']['b'])
+
+        response = json.loads(client.get('/config/hash?path=b.d&depth=0').data)
+        self.assertEquals({'b.d': conf_api.config_hash('b.d')}, response['hashes'])
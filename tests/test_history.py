@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from configurable import Configurable
+from formatting import FormatFactory
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.yml')
+        self.formatter.dump({'a': 1, 'b': {'c': 2, 'd': {'e': 3}}}, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as infile:
+            return self.formatter.load(infile)
+
+    def test_history(self):
+        conf_api = Configurable(local_file=self.file_name, history=3)
+        self.assertTrue(conf_api.copy_on_write)
+        loaded = conf_api.version
+
+        conf_api.merge_in_dict({'b': {'c': 4}})
+        conf_api['a'] = 5
+
+        self.assertEquals([(loaded, ['a', 'b']), (loaded + 1, ['b.c']), (loaded + 2, ['a'])],
+                          [(version, sorted(paths)) for version, _, paths in conf_api.history()])
+
+        # versions share what they didn't change
+        self.assertTrue(conf_api._version_config(loaded)['b']['d'] is conf_api.config['b']['d'])
+
+        self.assertEquals({'b.c': (4, 2), 'a': (5, 1)}, conf_api.diff(loaded))
+        self.assertEquals({'a': (1, 5)}, conf_api.diff(loaded + 2, loaded + 1))
+
+        # only the last 3 are kept
+        conf_api['f'] = 6
+        self.assertEquals(loaded + 1, conf_api.history()[0][0])
+        self.assertRaises(KeyError, conf_api.diff, loaded)
+
+    def test_rollback(self):
+        conf_api = Configurable(local_file=self.file_name, history=10)
+        before = conf_api.version
+        heard = []
+        conf_api.subscribe('', heard.append)
+
+        conf_api.merge_in_dict({'b': {'c': 4}, 'g': 7})
+        changes = conf_api.rollback(before)
+
+        self.assertEquals({'b.c': (2, 4), 'g': (None, 7)}, changes)
+        self.assertEquals({'a': 1, 'b': {'c': 2, 'd': {'e': 3}}}, conf_api.config)
+        self.assertEquals(before + 2, conf_api.version)
+        # it went through the usual write: listeners heard, and it's saved
+        self.assertEquals(changes, heard[-1])
+        self.assertEquals(conf_api.config, self.read_file())
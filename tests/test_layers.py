@@ -0,0 +1,147 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from configurable import Configurable
+from configurable.changes import MISSING
+from configurable.layers import Layers, environment_layer
+from configurable.schema import Schema
+from formatting import FormatFactory
+
+
+class LayersTest(unittest.TestCase):
+    def test_precedence(self):
+        flask_app = Flask(__name__)
+        flask_app.config['SECRET_KEY'] = 'flask'
+        flask_app.config['DEBUG'] = True
+
+        environ = {'APP_MYSQL__HOST': 'env-db', 'APP_MYSQL__PORT': '3307', 'OTHER': 'x'}
+        self.assertEquals({'mysql': {'host': 'env-db', 'port': '3307'}}, environment_layer('APP_', environ))
+        self.assertEquals({'mysql': {'host': 'env-db', 'port': 3307}},
+                          environment_layer('APP_', environ, Schema({'mysql.port': {'type': int}}).coerce))
+
+        conf_api = Configurable(defaults={'DEBUG': False, 'mysql': {'host': 'db', 'user': 'me'}})
+        conf_api.add_layer('environment', environment_layer('APP_', environ, int_or_str))
+        conf_api.attach_to_flask_app(flask_app)
+        self.assertEquals(['flask', 'config', 'environment'], conf_api.layers())
+
+        self.assertEquals('flask', conf_api['SECRET_KEY'])
+        self.assertEquals(False, conf_api['DEBUG'])
+        self.assertEquals({'host': 'env-db', 'port': 3307, 'user': 'me'}, conf_api['mysql'])
+        self.assertEquals('env-db', conf_api['mysql.host'])
+        self.assertEquals('flask', conf_api.source_of('SECRET_KEY'))
+
+        # a key written into flask's config after it's attached is seen by
+        # [] and get alike
+        conf_api._config['LATE'] = 2
+        self.assertEquals(2, conf_api['LATE'])
+        self.assertEquals(2, conf_api.get('LATE'))
+        self.assertEquals('config', conf_api.source_of('mysql.user'))
+        self.assertEquals('environment', conf_api.source_of('mysql.port'))
+        self.assertRaises(KeyError, conf_api.source_of, 'mysql.nope')
+
+        # writes go to the config layer, under the environment
+        conf_api.merge_in_dict({'mysql': {'host': 'new-db', 'user': 'you'}})
+        self.assertEquals('env-db', conf_api['mysql.host'])
+        self.assertEquals('you', conf_api['mysql.user'])
+        self.assertEquals({'DEBUG': False, 'mysql': {'host': 'new-db', 'user': 'you'}}, conf_api.config)
+
+        conf_api.override('mysql.host', 'override-db')
+        self.assertEquals('override-db', conf_api['mysql.host'])
+        self.assertEquals('overrides', conf_api.source_of('mysql.host'))
+        conf_api.clear_override('mysql.host')
+        self.assertEquals('env-db', conf_api['mysql.host'])
+
+        conf_api.set_layer('environment', {})
+        self.assertEquals('new-db', conf_api['mysql.host'])
+        self.assertEquals({'host': 'new-db', 'user': 'you'}, conf_api.resolved()['mysql'])
+
+    def test_environment_strings(self):
+        schema = Schema({'debug': {'type': bool}, 'ratio': {'type': float},
+                         'pools.*.size': {'type': int}, 'port': {'type': (str, int)}})
+        environ = {'APP_VERSION': '1.10', 'APP_LIMIT': '1e3', 'APP_NAME': 'null',
+                   'APP_DEBUG': 'true', 'APP_RATIO': '0.5', 'APP_POOLS__WEB__SIZE': 'x',
+                   'APP_PORT': '3307'}
+        self.assertEquals({'version': '1.10', 'limit': '1e3', 'name': 'null', 'debug': True,
+                           'ratio': 0.5, 'pools': {'web': {'size': 'x'}}, 'port': 3307},
+                          environment_layer('APP_', environ, schema.coerce))
+
+    def test_file_layer(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'override.yml')
+            write(path, {'mysql': {'host': 'site-db'}})
+
+            conf_api = Configurable(defaults={'mysql': {'host': 'db', 'port': 3306}})
+            conf_api.add_layer('deployment', path)
+            self.assertEquals(['config', 'deployment'], conf_api.layers())
+            self.assertEquals('site-db', conf_api['mysql.host'])
+            self.assertEquals('deployment', conf_api.source_of('mysql.host'))
+            self.assertEquals([], conf_api.reload_layers())
+
+            write(path, {'mysql': {'port': 3307}})
+            self.assertEquals(['deployment'], conf_api.reload_layers())
+            self.assertEquals({'host': 'db', 'port': 3307}, conf_api['mysql'])
+
+            os.remove(path)
+            self.assertEquals(['deployment'], conf_api.reload_layers())
+            self.assertEquals({'host': 'db', 'port': 3306}, conf_api['mysql'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_without_layers(self):
+        conf_api = Configurable(defaults={'a': {'b': 1}})
+        self.assertEquals(['config'], conf_api.layers())
+        self.assertEquals('config', conf_api.source_of('a.b'))
+        self.assertTrue(conf_api.resolved() is conf_api.config)
+
+    def test_incremental_view(self):
+        # after any series of changes, the view is what merging every layer
+        # from scratch would give
+        keys = ['a', 'b', 'c']
+        values = [1, 'x', None, {}, {'a': 2}, {'b': {'c': 3}}]
+        rng = random.Random(7)
+
+        layers = Layers()
+        for name in ('bottom', 'middle', 'top'):
+            layers.insert(len(layers.names), name, {})
+        for _ in range(300):
+            name = rng.choice(layers.names)
+            current = layers.values[layers.names.index(name)]
+            path = tuple(rng.choice(keys) for _ in range(rng.randint(1, 3)))
+            updated = set_path(current, path, rng.choice(values + [MISSING]))
+            layers.replace(name, updated)
+
+            fresh = Layers()
+            for index, fresh_name in enumerate(layers.names):
+                fresh.insert(index, fresh_name, layers.values[index])
+            self.assertEquals(fresh.view, layers.view)
+
+
+def int_or_str(keys, value):
+    return int(value) if value.isdigit() else value
+
+
+def write(path, config):
+    with open(path, 'wb') as outfile:
+        FormatFactory.for_path(path).dump(config, outfile)
+    # a new mtime each time, however coarse the filesystem's
+    os.utime(path, (0, os.stat(path).st_mtime + 1))
+
+
+def set_path(config, path, value):
+    # a copy of config with value (or nothing, for MISSING) at path
+    config = dict(config)
+    if len(path) == 1:
+        if value is MISSING:
+            config.pop(path[0], None)
+        else:
+            config[path[0]] = value
+        return config
+    child = config.get(path[0])
+    config[path[0]] = set_path(child if isinstance(child, dict) else {}, path[1:], value)
+    return config
@@ -1,6 +1,7 @@
 import unittest
 
 from configurable import Configurable
+from configurable.changes import compose_patches
 
 
 class MergeTest(unittest.TestCase):
@@ -58,3 +59,27 @@ class MergeTest(unittest.TestCase):
         self.assertEquals({'b.d': ({'f': {1, 2, 3}}, None)}, changes)
 
         self.assertEquals(expected, conf_api.config)
+
+    def test_sibling_merge(self):
+        base_conf = {'a': 1, 'b': {'c': 2}}
+
+        merge_in = {'a': 3, 'b': {'c': 4, 'd': 5}}
+
+        conf_api = Configurable(defaults=base_conf)
+        changes = conf_api.merge_in_dict(merge_in)
+
+        # Check the changes: each path is relative to the root, not its sibling
+        self.assertEquals({'a': (3, 1), 'b.c': (4, 2), 'b.d': (5, None)}, changes)
+
+        self.assertEquals({'a': 3, 'b': {'c': 4, 'd': 5}}, conf_api.config)
+
+    def test_compose_patches(self):
+        patches = [
+            {'a': 1, 'b': {'c': 2}},
+            {'b.d': 3, 'e': {'f': 4}},
+            {'e': 5, 'b': {'c': 6}},
+        ]
+
+        # later patches win, dicts combine, and paths become sections
+        self.assertEquals({'a': 1, 'b': {'c': 6, 'd': 3}, 'e': 5},
+                          compose_patches(patches))
@@ -0,0 +1,65 @@
+import json
+import unittest
+
+from flask import Flask
+
+from configurable import Configurable
+from configurable.metrics import HotKeys, Metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.test_app = Flask('test_api')
+        self.test_config = {'a': 1, 'b': {'c': 2}}
+
+    def test_off_by_default(self):
+        conf_api = Configurable(flask_app=self.test_app, defaults=self.test_config)
+        self.assertTrue(conf_api.metrics is None)
+
+        response = self.test_app.test_client().get('/config/metrics')
+        self.assertEquals(404, response.status_code)
+
+    def test_metrics(self):
+        observed = []
+        metrics = Metrics(hooks=[lambda name, seconds: observed.append(name)],
+                          key_sample_rate=1)
+        conf_api = Configurable(flask_app=self.test_app, defaults=self.test_config,
+                                metrics=metrics)
+        client = self.test_app.test_client()
+
+        conf_api.merge_in_dict({'b': {'c': 3}})
+        client.get('/config/')
+        for _ in range(5):
+            conf_api['a']
+        conf_api['b.c']
+
+        # the hooks saw everything as it happened
+        self.assertTrue('merge' in observed)
+        self.assertTrue('serve' in observed)
+        self.assertTrue('lock_wait' in observed)
+
+        response = client.get('/config/metrics')
+        snapshot = json.loads(response.data)
+        self.assertEquals(1, snapshot['merge']['count'])
+        self.assertEquals(1, snapshot['serve']['count'])
+        self.assertEquals(['+Inf', 1], snapshot['merge']['buckets'][-1])
+        self.assertEquals(['a', 5], snapshot['hot_keys'][0])
+
+        response = client.get('/config/metrics?format=prometheus')
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.data.decode('utf-8')
+        self.assertTrue('configurable_merge_seconds_count 1' in text)
+        self.assertTrue('configurable_merge_seconds_bucket{le="+Inf"} 1' in text)
+        self.assertTrue('configurable_key_reads{key="a"} 5' in text)
+
+    def test_hot_keys(self):
+        hot_keys = HotKeys(sample_rate=4, top=2)
+        for key, reads in (('x', 400), ('y', 200), ('z', 40)):
+            for _ in range(reads):
+                hot_keys.add(key)
+
+        top = hot_keys.top()
+        self.assertEquals(['x', 'y'], [key for key, _ in top])
+        # count-min only ever overestimates, and the sampling is even here
+        self.assertTrue(top[0][1] >= 400)
+        self.assertTrue(top[1][1] >= 200)
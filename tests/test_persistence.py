@@ -0,0 +1,232 @@
+import os
+import tempfile
+import time
+import unittest
+
+from configurable import Configurable
+from formatting import FormatFactory, Formatter
+
+
+class CountingConfigurable(Configurable):
+    saves = 0
+
+    def save(self):
+        self.saves += 1
+        super(CountingConfigurable, self).save()
+
+
+class WriteBehindTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        self.formatter.dump({'a': 0}, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as infile:
+            return self.formatter.load(infile)
+
+    def test_flush_coalesces(self):
+        conf_api = CountingConfigurable(local_file=self.file_name, save_delay=60)
+
+        for i in range(50):
+            conf_api['key{}'.format(i)] = i
+
+        # nothing's been written yet...
+        self.assertEquals(0, conf_api.saves)
+        self.assertEquals({'a': 0}, self.read_file())
+
+        # ...and flushing writes all 50 in one save
+        conf_api.flush()
+        self.assertEquals(1, conf_api.saves)
+        self.assertEquals(conf_api.config, self.read_file())
+
+        # nothing pending, nothing saved
+        conf_api.flush()
+        self.assertEquals(1, conf_api.saves)
+
+    def test_saves_in_background(self):
+        conf_api = CountingConfigurable(local_file=self.file_name,
+                                        save_delay=60, save_max_pending=5)
+        for i in range(5):
+            conf_api['key{}'.format(i)] = i
+
+        deadline = time.time() + 5
+        while self.read_file() != conf_api.config and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEquals(1, conf_api.saves)
+        self.assertEquals(conf_api.config, self.read_file())
+
+    def test_delay(self):
+        conf_api = CountingConfigurable(local_file=self.file_name, save_delay=0.05)
+        conf_api['b'] = 1
+
+        # saves counts a save as it starts: wait for what it writes
+        deadline = time.time() + 5
+        while self.read_file() != {'a': 0, 'b': 1} and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEquals({'a': 0, 'b': 1}, self.read_file())
+
+    def test_merges_stay_in_memory(self):
+        conf_api = CountingConfigurable(local_file=self.file_name)
+        conf_api.merge_in_dict({'b': {'c': 1}})
+        self.assertEquals(0, conf_api.saves)
+        self.assertEquals({'a': 0}, self.read_file())
+
+        conf_api['d'] = 2
+        self.assertEquals(1, conf_api.saves)
+        self.assertEquals({'a': 0, 'b': {'c': 1}, 'd': 2}, self.read_file())
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+        self.test_config = {
+            'application': {'debug': False},
+            'mysql': {'host': 'localhost', 'words': ['a', 'b']}
+        }
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        self.formatter.dump(self.test_config, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+        self.journal_name = self.file_name + '.journal'
+
+    def tearDown(self):
+        for name in (self.file_name, self.journal_name):
+            if os.path.exists(name):
+                os.unlink(name)
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as infile:
+            return self.formatter.load(infile)
+
+    def test_writes_go_to_journal(self):
+        conf_api = CountingConfigurable(local_file=self.file_name, journal=True)
+        conf_api.merge_in_dict({'mysql': {'host': 'db', 'port': 3306}})
+        conf_api['application'] = {'debug': True, 'tags': {'x', 'y'}}
+
+        # the config file wasn't touched, only the journal was
+        self.assertEquals(0, conf_api.saves)
+        self.assertEquals(self.test_config, self.read_file())
+        self.assertTrue(os.path.exists(self.journal_name))
+
+        # a fresh load replays the journal on top of the file
+        reloaded = Configurable(local_file=self.file_name, journal=True)
+        self.assertEquals(conf_api.config, reloaded.config)
+
+        # saving compacts the journal into the file
+        reloaded.save()
+        self.assertFalse(os.path.exists(self.journal_name))
+        self.assertEquals(conf_api.config, self.read_file())
+
+    def test_compacts(self):
+        conf_api = CountingConfigurable(local_file=self.file_name, journal=True,
+                                        journal_compact_every=3)
+        for i in range(7):
+            conf_api['key{}'.format(i)] = i
+
+        self.assertEquals(2, conf_api.saves)
+        self.assertEquals(Configurable(local_file=self.file_name, journal=True).config,
+                          conf_api.config)
+
+    def test_partial_record(self):
+        conf_api = Configurable(local_file=self.file_name, journal=True)
+        conf_api['a'] = 1
+        conf_api['b'] = 2
+
+        # chop the last record in half
+        with open(self.journal_name, 'rb') as journal_file:
+            journal = journal_file.read()
+        with open(self.journal_name, 'wb') as journal_file:
+            journal_file.write(journal[:-3])
+
+        reloaded = Configurable(local_file=self.file_name, journal=True)
+        self.assertEquals(1, reloaded['a'])
+        self.assertFalse('b' in reloaded.config)
+
+        # the partial record got compacted away
+        self.assertFalse(os.path.exists(self.journal_name))
+        self.assertEquals(reloaded.config, self.read_file())
+
+    def test_permissions(self):
+        conf_api = Configurable(local_file=self.file_name, journal=True)
+        conf_api['a'] = 1
+        self.assertEquals(0o600, os.stat(self.journal_name).st_mode & 0o777)
+
+        # a journal others can write to could hold any pickle: it's refused
+        os.chmod(self.journal_name, 0o666)
+        self.assertRaises(ValueError, Configurable, local_file=self.file_name, journal=True)
+
+
+class CountingYAML(object):
+    loads_called = 0
+
+    @classmethod
+    def loads(cls, string):
+        cls.loads_called += 1
+        return FormatFactory.get_formatter().loads(string)
+
+
+class BinaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        self.formatter.dump({'a': {'b': 1}}, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+        self.cache_name = self.file_name + '.cache'
+        CountingYAML.loads_called = 0
+
+    def tearDown(self):
+        for name in (self.file_name, self.cache_name):
+            if os.path.exists(name):
+                os.unlink(name)
+
+    def load(self):
+        return Configurable.load_from_file(self.file_name, Formatter('yml', CountingYAML),
+                                           cache_path=self.cache_name)
+
+    def test_cache(self):
+        # the first load parses and writes the snapshot...
+        self.assertEquals({'a': {'b': 1}}, self.load())
+        self.assertEquals(1, CountingYAML.loads_called)
+        self.assertTrue(os.path.exists(self.cache_name))
+
+        # ...which the next one uses instead of parsing
+        self.assertEquals({'a': {'b': 1}}, self.load())
+        self.assertEquals(1, CountingYAML.loads_called)
+
+        # a changed file means a stale snapshot
+        Configurable.save_to_file({'a': {'b': 2}}, self.file_name, self.formatter)
+        self.assertEquals({'a': {'b': 2}}, self.load())
+        self.assertEquals(2, CountingYAML.loads_called)
+
+        # as does a corrupt one
+        with open(self.cache_name, 'wb') as cache_file:
+            cache_file.write(b'garbage')
+        self.assertEquals({'a': {'b': 2}}, self.load())
+        self.assertEquals(3, CountingYAML.loads_called)
+
+    def test_permissions(self):
+        self.load()
+        self.assertEquals(0o600, os.stat(self.cache_name).st_mode & 0o777)
+
+        # a snapshot others can write to is parsed around, and replaced
+        os.chmod(self.cache_name, 0o666)
+        self.assertEquals({'a': {'b': 1}}, self.load())
+        self.assertEquals(2, CountingYAML.loads_called)
+        self.assertEquals(0o600, os.stat(self.cache_name).st_mode & 0o777)
+
+    def test_configurable(self):
+        conf_api = Configurable(local_file=self.file_name, binary_cache=True)
+        self.assertTrue(os.path.exists(self.cache_name))
+        self.assertEquals(conf_api.config,
+                          Configurable(local_file=self.file_name, binary_cache=True).config)
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from configurable import Configurable
+from configurable.schema import Schema, SchemaError
+from formatting import FormatFactory
+
+RULES = {
+    'mysql.host': {'type': str, 'required': True},
+    'mysql.port': {'type': int, 'min': 1, 'max': 65535},
+    'pools.*.size': {'type': int, 'min': 0},
+    'pools': {'validator': lambda pools: sum(pool.get('size', 0) for pool in pools.values()) <= 10},
+    'log_level': {'choices': ['debug', 'info']},
+    'ratio': {'type': float},
+}
+
+
+class SchemaTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.yml')
+        self.formatter.dump({'mysql': {'host': 'db', 'port': 3306},
+                             'pools': {'web': {'size': 4}}}, temp_file)
+        temp_file.close()
+        self.file_name = temp_file.name
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def write_file(self, config):
+        with open(self.file_name, 'wb') as outfile:
+            self.formatter.dump(config, outfile)
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as infile:
+            return self.formatter.load(infile)
+
+    def assertErrors(self, errors, write, *args):
+        try:
+            write(*args)
+        except SchemaError as schema_error:
+            self.assertEquals(errors, sorted(path for path, _ in schema_error.errors))
+        else:
+            self.fail('no SchemaError')
+
+    def test_validate(self):
+        schema = Schema(RULES)
+        schema.validate({'mysql': {'host': 'db'}, 'ratio': 1, 'pools': {}})
+        self.assertErrors(['mysql.host', 'mysql.port', 'pools', 'pools.a.size', 'ratio'],
+                          schema.validate,
+                          {'mysql': {'port': 0}, 'ratio': True,
+                           'pools': {'a': {'size': 'x'}, 'b': {'size': 11}}})
+        self.assertErrors(['mysql.host'], schema.validate, {})
+
+    def test_writes(self):
+        conf_api = Configurable(local_file=self.file_name, schema=RULES)
+        version = conf_api.version
+
+        conf_api.merge_in_dict({'mysql': {'port': 3307}, 'pools': {'api': {'size': 6}}})
+        self.assertEquals(version + 1, conf_api.version)
+
+        # all or nothing
+        self.assertErrors(['mysql.port'], conf_api.merge_in_dict,
+                          {'mysql': {'port': 'x'}, 'log_level': 'debug'})
+        self.assertErrors(['pools'], conf_api.merge_in_dict, {'pools': {'web': {'size': 5}}})
+        self.assertErrors(['mysql.host'], conf_api.merge_in_dict, {'mysql': 'db'})
+        self.assertErrors(['log_level'], conf_api.__setitem__, 'log_level', 'loud')
+        self.assertEquals(version + 1, conf_api.version)
+        self.assertEquals({'mysql': {'host': 'db', 'port': 3307},
+                           'pools': {'web': {'size': 4}, 'api': {'size': 6}}}, conf_api.config)
+        self.assertEquals(4, self.read_file()['pools']['web']['size'])
+
+        # a file that doesn't fit isn't taken in
+        self.write_file({'mysql': {'port': 1}})
+        self.assertErrors(['mysql.host'], conf_api.load)
+        self.assertEquals('db', conf_api['mysql.host'])
+
+    def test_config_patch(self):
+        test_app = Flask(__name__)
+        conf_api = Configurable(flask_app=test_app, api_writes=True, schema=RULES,
+                                defaults={'mysql': {'host': 'db'}})
+        response = test_app.test_client().patch('/config/', data=json.dumps({'mysql.port': -1}))
+        self.assertEquals(400, response.status_code)
+        self.assertEquals({'errors': {'mysql.port': 'less than 1'}}, json.loads(response.data))
+        self.assertEquals({'mysql': {'host': 'db'}}, conf_api.config)
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from configurable import Configurable
+from formatting import FormatFactory
+
+
+class CountingConfigurable(Configurable):
+    loads = 0
+
+    def load(self):
+        self.loads += 1
+        return super(CountingConfigurable, self).load()
+
+
+def write_in_child(shared_file):
+    conf_api = Configurable(shared_file=shared_file)
+    conf_api.merge_in_dict({'mysql': {'host': 'from the child'}})
+
+
+class SharedTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.shared_file = os.path.join(self.temp_dir, 'config.shm')
+        self.local_file = os.path.join(self.temp_dir, 'config.yml')
+        Configurable.save_to_file({'mysql': {'host': 'localhost'}, 'debug': False},
+                                  self.local_file, FormatFactory.get_formatter())
+
+    def tearDown(self):
+        for name in os.listdir(self.temp_dir):
+            os.unlink(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+
+    def test_share(self):
+        first = Configurable(local_file=self.local_file, shared_file=self.shared_file)
+        second = Configurable(local_file=self.local_file, shared_file=self.shared_file)
+        self.assertEquals(first.config, second.config)
+
+        seen = []
+        second.subscribe('', seen.append)
+
+        # a write in one is read in the other, and told to its listeners
+        first['debug'] = True
+        self.assertEquals(True, second['debug'])
+        self.assertEquals([{'debug': (True, False)}], seen)
+
+        # writes go both ways without losing each other's
+        second.merge_in_dict({'mysql': {'port': 3306}})
+        first.merge_in_dict({'mysql': {'host': 'db'}})
+        self.assertEquals({'host': 'db', 'port': 3306}, second['mysql'])
+        self.assertEquals(second['mysql'], first['mysql'])
+
+    def test_skips_parsing(self):
+        Configurable(local_file=self.local_file, shared_file=self.shared_file)
+
+        conf_api = CountingConfigurable(local_file=self.local_file, shared_file=self.shared_file)
+        self.assertEquals('localhost', conf_api['mysql.host'])
+        self.assertEquals(0, conf_api.loads)
+
+    def test_stale_snapshot(self):
+        # the snapshot outlives the processes, but not an edit of the file
+        Configurable(local_file=self.local_file, shared_file=self.shared_file)
+        Configurable.save_to_file({'mysql': {'host': 'new-db'}},
+                                  self.local_file, FormatFactory.get_formatter())
+        os.utime(self.local_file, (0, os.stat(self.local_file).st_mtime + 1))
+
+        conf_api = CountingConfigurable(local_file=self.local_file, shared_file=self.shared_file)
+        self.assertEquals('new-db', conf_api['mysql.host'])
+        self.assertEquals(1, conf_api.loads)
+
+        # and the next one takes the fresh snapshot
+        conf_api = CountingConfigurable(local_file=self.local_file, shared_file=self.shared_file)
+        self.assertEquals('new-db', conf_api['mysql.host'])
+        self.assertEquals(0, conf_api.loads)
+
+    def test_refuses_writable_file(self):
+        Configurable(shared_file=self.shared_file)
+        self.assertEquals(0o600, os.stat(self.shared_file).st_mode & 0o777)
+
+        os.chmod(self.shared_file, 0o666)
+        self.assertRaises(ValueError, Configurable, shared_file=self.shared_file)
+
+    def test_across_processes(self):
+        conf_api = Configurable(local_file=self.local_file, shared_file=self.shared_file)
+
+        child = multiprocessing.Process(target=write_in_child, args=(self.shared_file,))
+        child.start()
+        child.join()
+
+        self.assertEquals('from the child', conf_api['mysql.host'])
+        self.assertEquals(False, conf_api['debug'])
+
+    def test_grows(self):
+        first = Configurable(shared_file=self.shared_file)
+        second = Configurable(shared_file=self.shared_file)
+
+        big = dict(('key{}'.format(i), 'x' * 100) for i in range(20000))
+        first.merge_in_dict({'big': big})
+        self.assertEquals(big, second['big'])
@@ -0,0 +1,54 @@
+import threading
+import unittest
+
+from configurable import Configurable
+
+
+class SubscriptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.test_config = {
+            'application': {'debug': False},
+            'mysql': {'host': 'localhost', 'port': 3306}
+        }
+
+    def test_prefixes(self):
+        conf_api = Configurable(defaults=self.test_config)
+        everything, mysql, mysql_host, application = [], [], [], []
+        conf_api.subscribe('', everything.append)
+        conf_api.subscribe('mysql', mysql.append)
+        conf_api.subscribe('mysql.host', mysql_host.append)
+        conf_api.subscribe('application', application.append)
+
+        conf_api.merge_in_dict({'mysql': {'host': 'db', 'port': 3306}})
+
+        # port didn't actually change, and application wasn't touched
+        self.assertEquals([{'mysql.host': ('db', 'localhost')}], everything)
+        self.assertEquals([{'mysql.host': ('db', 'localhost')}], mysql)
+        self.assertEquals([{'mysql.host': ('db', 'localhost')}], mysql_host)
+        self.assertEquals([], application)
+
+        # replacing a whole subtree tells the listeners inside it too
+        conf_api['mysql'] = {'host': 'other'}
+        self.assertEquals(2, len(mysql_host))
+        self.assertEquals({'mysql': ({'host': 'other'}, {'host': 'db', 'port': 3306})},
+                          mysql_host[1])
+
+        conf_api.unsubscribe('mysql', mysql.append)
+        conf_api.merge_in_dict({'mysql': {'host': 'again'}})
+        self.assertEquals(2, len(mysql))
+        self.assertEquals(3, len(mysql_host))
+
+    def test_background(self):
+        conf_api = Configurable(defaults=self.test_config)
+        called = threading.Event()
+        threads = []
+
+        def listener(changes):
+            threads.append(threading.current_thread())
+            called.set()
+
+        conf_api.subscribe('application', listener, background=True)
+        conf_api.merge_in_dict({'application': {'debug': True}})
+
+        self.assertTrue(called.wait(5))
+        self.assertFalse(threads[0] is threading.current_thread())
@@ -0,0 +1,142 @@
+import threading
+import time
+import unittest
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+try:
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from socketserver import ThreadingMixIn
+
+from configurable import Configurable
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(application, port=0):
+    """
+    :returns tuple
+        (server, url of its /config/), serving on a background thread
+    """
+    server = make_server('127.0.0.1', port, application,
+                         server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:{}/config/'.format(server.server_port)
+
+
+def not_found(environ, start_response):
+    start_response('404 Not Found', [])
+    return [b'']
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class UpstreamTest(unittest.TestCase):
+    def setUp(self):
+        self.central = Configurable(defaults={'a': 1, 'b': {'c': 2, 'd': 3}})
+        self.server, self.url = serve(self.central.wsgi_middleware(not_found))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_follow(self):
+        for long_poll in (True, False):
+            edge = Configurable(defaults={'old': True})
+            heard = []
+            edge.subscribe('', heard.append)
+            upstream = edge.follow(self.url, long_poll=long_poll, interval=0.02, timeout=5)
+            try:
+                # 1. the whole config, replacing what was there
+                self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+
+                # 2. then each write, as a change set of its own
+                self.central.merge_in_dict({'b': {'c': 4}})
+                self.assertTrue(wait_for(lambda: edge.get('b.c') == 4))
+                self.assertEquals({'b.c': (4, 2)}, heard[-1])
+
+                self.central._commit_diff({'a': 1, 'b': {'c': 4}})
+                self.assertTrue(wait_for(lambda: 'd' not in edge['b']))
+                self.assertEquals({'b.d': (None, 3)}, heard[-1])
+            finally:
+                edge.stop_following()
+            self.assertEquals(self.central.version, upstream.version)
+            self.central._commit_diff({'a': 1, 'b': {'c': 2, 'd': 3}})
+
+    def test_upstream_down(self):
+        edge = Configurable()
+        upstream = edge.follow(self.url, long_poll=False, interval=0.02, max_backoff=0.05)
+        try:
+            self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+
+            port = self.server.server_port
+            self.server.shutdown()
+            self.server.server_close()
+            self.assertTrue(wait_for(lambda: upstream.failures >= 2))
+            # the last config it got stays
+            self.assertEquals(self.central.config, edge.config)
+
+            # and it picks up again once the upstream is back
+            self.central['a'] = 5
+            self.server, _ = serve(self.central.wsgi_middleware(not_found), port)
+            self.assertTrue(wait_for(lambda: edge.get('a') == 5))
+            self.assertEquals(0, upstream.failures)
+        finally:
+            edge.stop_following()
+
+    def test_replaced_sections(self):
+        edge = Configurable()
+        edge.follow(self.url, long_poll=False, interval=0.02)
+        try:
+            self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+            version = self.central.version
+
+            # a section set anew drops its old keys; a key with a dot is one key
+            self.central['b'] = {'c': 5}
+            self.central.merge_in_dict({'hosts': {'db.example.com': {'port': 1}}})
+            self.central.merge_in_dict({'hosts': {'db.example.com': {'port': 2}}})
+            _, changed, _ = self.central.changes_since(version)
+            self.assertEquals({'b': {'c': 5}, 'hosts': {'db.example.com': {'port': 2}}}, changed)
+            self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+
+            self.central.merge_in_dict({'hosts': {'db.example.com': {'port': 3}}})
+            self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+            self.assertEquals({'db.example.com': {'port': 3}}, edge['hosts'])
+        finally:
+            edge.stop_following()
+
+    def test_schema_rejection(self):
+        warnings = []
+
+        class Logger(object):
+            def warning(self, message, *args):
+                warnings.append(message.format(*args))
+
+        edge = Configurable(schema={'a': {'type': int}})
+        upstream = edge.follow(self.url, long_poll=False, interval=0.02, max_backoff=0.05,
+                               logger=Logger())
+        try:
+            self.assertTrue(wait_for(lambda: edge.config == self.central.config))
+            self.central['a'] = 'x'
+            self.assertTrue(wait_for(lambda: upstream.failures >= 2))
+            self.assertEquals(1, edge['a'])
+            self.assertTrue(warnings[-1].startswith('upstream config rejected by the schema: a: '))
+        finally:
+            edge.stop_following()
+            self.central['a'] = 1
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import time
+import unittest
+
+from configurable import Configurable
+from configurable.watching import FileWatcher
+from formatting import FormatFactory
+
+
+class WatchingTest(unittest.TestCase):
+    def setUp(self):
+        self.formatter = FormatFactory.get_formatter()
+        self.test_config = {
+            'application': {'debug': False},
+            'mysql': {'host': 'localhost', 'words': ['a', 'b']}
+        }
+
+        temp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(temp_dir, 'config.yml')
+        self.write_file(self.test_config)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+        os.rmdir(os.path.dirname(self.file_name))
+
+    def write_file(self, config):
+        Configurable.save_to_file(config, self.file_name, self.formatter)
+
+    def wait_for(self, condition):
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_load_applies_diff(self):
+        conf_api = Configurable(local_file=self.file_name)
+        mysql = conf_api['mysql']
+        version = conf_api.version
+
+        # same file: nothing changes, not even the version
+        self.assertEquals({}, conf_api.load())
+        self.assertEquals(version, conf_api.version)
+
+        self.write_file({'application': {'debug': True},
+                         'mysql': {'host': 'localhost', 'words': ['a', 'b']}})
+
+        self.assertEquals({'application.debug': (True, False)}, conf_api.load())
+        self.assertEquals(version + 1, conf_api.version)
+        self.assertTrue(mysql is conf_api['mysql'])
+
+        # keys that left the file leave the config
+        self.write_file({'mysql': {'host': 'localhost', 'words': ['a', 'b']}})
+        self.assertEquals({'application': (None, {'debug': True})}, conf_api.load())
+        self.assertFalse('application' in conf_api.config)
+
+    def test_watch(self):
+        for use_inotify in (True, False):
+            self.write_file(self.test_config)
+            conf_api = Configurable(local_file=self.file_name, copy_on_write=True)
+            conf_api.watch(interval=0.05, use_inotify=use_inotify)
+            mysql = conf_api['mysql']
+
+            self.write_file({'application': {'debug': True},
+                             'mysql': {'host': 'localhost', 'words': ['a', 'b']}})
+
+            self.assertTrue(self.wait_for(lambda: conf_api['application']['debug']))
+            self.assertTrue(mysql is conf_api['mysql'])
+            conf_api.stop_watching()
+
+    def test_file_watcher_checks(self):
+        changes = []
+        watcher = FileWatcher(self.file_name, lambda: changes.append(1),
+                              interval=60, use_inotify=False)
+
+        # the file hasn't changed
+        self.assertFalse(watcher.check())
+
+        self.write_file({'a': 1})
+        self.assertTrue(watcher.check())
+        self.assertFalse(watcher.check())
+        self.assertEquals(1, len(changes))
+
+        # our own writes can be marked as seen
+        self.write_file({'a': 2})
+        watcher.mark_seen()
+        self.assertFalse(watcher.check())
+
+        watcher.stop()
+
+    def test_watch_config_dir(self):
+        directory = os.path.dirname(self.file_name)
+        fragment = os.path.join(directory, '10-base.yml')
+        override = os.path.join(directory, 'override.json')
+        try:
+            for use_inotify in (True, False):
+                self.write_fragment(fragment, {'a': 1})
+                conf_api = Configurable(config_dir=directory, defaults={'b': 1})
+                conf_api.watch(interval=0.05, use_inotify=use_inotify)
+
+                self.write_fragment(fragment, {'a': 2})
+                self.assertTrue(self.wait_for(lambda: conf_api.config.get('a') == 2))
+
+                # a new fragment shows up too
+                self.write_fragment(os.path.join(directory, '20-site.yml'), {'c': 3})
+                self.assertTrue(self.wait_for(lambda: conf_api.config.get('c') == 3))
+                os.unlink(os.path.join(directory, '20-site.yml'))
+                conf_api.stop_watching()
+
+                # and with only a layer file, that's read again
+                self.write_fragment(override, {'b': 2})
+                conf_api = Configurable(defaults={'b': 1})
+                conf_api.add_layer('deployment', override)
+                conf_api.watch(interval=0.05, use_inotify=use_inotify)
+                self.write_fragment(override, {'b': 3})
+                self.assertTrue(self.wait_for(lambda: conf_api['b'] == 3))
+                conf_api.stop_watching()
+        finally:
+            os.unlink(fragment)
+            os.unlink(override)
+
+    def test_watch_nothing(self):
+        logger = RecordingLogger()
+        conf_api = Configurable(defaults={'a': 1}, logger=logger)
+        conf_api.watch()
+        self.assertTrue(conf_api._watcher is None)
+        self.assertEquals(1, len(logger.warnings))
+
+    def write_fragment(self, path, config):
+        with open(path, 'wb') as outfile:
+            FormatFactory.for_path(path).dump(config, outfile)
+        # a new mtime each time, however coarse the filesystem's
+        os.utime(path, (0, os.stat(path).st_mtime + 1))
+
+
+class RecordingLogger(object):
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args):
+        pass
+
+    def warning(self, *args):
+        self.warnings.append(args)